@@ -0,0 +1,135 @@
+"""Compare change detection + fan-out: raw payload scan vs snapshot diff.
+
+The legacy side matches every user against the whole payload. The snapshot
+side runs GardenBot.process_stock_update (selection by diff and posted alerts,
+then per-user matching) with the dispatcher stubbed out. Both render the same
+notification lines for every user whose alerts change.
+
+Usage: python bench/bench_diff.py [users]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from constants import TRACKABLE_ITEMS  # noqa: E402
+
+
+def make_payload(timestamp, rng):
+    data = []
+    for category in ('SEEDS', 'GEAR', 'EGG'):
+        names = rng.sample(TRACKABLE_ITEMS[category], k=len(TRACKABLE_ITEMS[category]) // 2)
+        data.append({
+            'section': f"{category} STOCK",
+            'items': [{'name': name, 'quantity': rng.randint(1, 5)} for name in names],
+        })
+    return {'timestamp': timestamp, 'data': data}
+
+
+def make_users(count, rng):
+    users = {}
+    for user_id in range(count):
+        users[str(user_id)] = {
+            'tracking_enabled': True,
+            'tracked_items': {
+                category: rng.sample(TRACKABLE_ITEMS[category], k=3) for category in ('SEEDS', 'GEAR', 'EGG')
+            },
+        }
+    return users
+
+
+class StubDispatcher:
+    def begin_tick(self, label):
+        pass
+
+    def end_tick(self):
+        pass
+
+
+def render(category, name, quantity):
+    return f"✅ {name} in {category} - {quantity}"
+
+
+def legacy(old, new, users, groups):
+    """Pre-diff approach: on any change, match every user against the whole payload"""
+    rendered = {}
+    if new == old:
+        return rendered
+    for user_id, user_data in users.items():
+        for section in new['data']:
+            category = section['section'].split()[0]
+            tracked_items = user_data['tracked_items'][category]
+            lines = rendered.setdefault((user_id, groups[category]), [])
+            for item in section['items']:
+                if item['name'] in tracked_items:
+                    lines.append(render(category, item['name'], item['quantity']))
+    return rendered
+
+
+def make_bot(users, posted):
+    """GardenBot with `users`, alerts posted for `posted` (user_id, group) and a stub dispatcher"""
+    import bot as bot_module
+    from tracking import UserState
+
+    garden = bot_module.GardenBot()
+    garden.dispatcher = StubDispatcher()
+    garden.users = {user_id: UserState.from_dict(data) for user_id, data in users.items()}
+    for user_id, user_data in garden.users.items():
+        garden.index_user(user_id, user_data)
+    for message_id, (user_id, group) in enumerate(posted):
+        garden.notification_messages.entries.setdefault(user_id, {})[group] = [(message_id, time.time())]
+    rendered = {}
+
+    def record(user_id, group, lines, **kwargs):
+        rendered[(user_id, group)] = lines
+
+    garden.replace_notifications = record
+    return garden, rendered
+
+
+def main():
+    user_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    os.chdir(tempfile.mkdtemp(prefix='garden-bench-'))
+    from bot import CATEGORY_GROUPS
+
+    rng = random.Random(42)
+    users = make_users(user_count, rng)
+    old = make_payload('t0', rng)
+    rotated = make_payload('t1', rng)
+    # Eggs rotate every 30 minutes, so most 5-minute ticks leave the EGG section as it was
+    seeds_gear = dict(rotated, data=[section for section in rotated['data'] if section['section'] != 'EGG STOCK'])
+    seeds_gear['data'].append(next(section for section in old['data'] if section['section'] == 'EGG STOCK'))
+
+    before = legacy(None, old, users, CATEGORY_GROUPS)
+    garden, rendered = make_bot(users, [key for key, lines in before.items() if lines])
+    garden.last_stock = old
+    loop = asyncio.new_event_loop()
+    update_time = datetime.now()
+    print(f"users: {user_count}")
+
+    for label, new in (('full rotation', rotated), ('seeds/gear only', seeds_gear)):
+        def snapshot_diff():
+            loop.run_until_complete(garden.process_stock_update(new, None, update_time))
+
+        # Same lines for every alert the diff re-renders, and no changed alert left out
+        rendered.clear()
+        snapshot_diff()
+        after = legacy(old, new, users, CATEGORY_GROUPS)
+        assert all(after[key] == [text for text, _ in lines] for key, lines in rendered.items())
+        assert all(key in rendered for key, lines in after.items() if lines != before.get(key, []))
+
+        runs = 20
+        legacy_time = timeit.timeit(lambda: legacy(old, new, users, CATEGORY_GROUPS), number=runs) / runs
+        diff_time = timeit.timeit(snapshot_diff, number=runs) / runs
+        print(f"{label}: {len(rendered)} of {len(after)} alerts re-rendered")
+        print(f"  legacy scan:   {legacy_time * 1000:.2f} ms/tick")
+        print(f"  snapshot diff: {diff_time * 1000:.2f} ms/tick ({legacy_time / diff_time:.1f}x the legacy speed)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Memory and matching cost of per-user tracking state: name lists vs bitmasks.
+
+Usage: python bench/bench_tracking.py [users]
+"""
+import os
+import random
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from constants import TRACKABLE_ITEMS  # noqa: E402
+from snapshot import StockSnapshot  # noqa: E402
+from tracking import UserState  # noqa: E402
+
+
+def make_records(count, rng):
+    return {
+        str(user_id): {
+            'tracking_enabled': True,
+            'tracked_items': {
+                category: rng.sample(items, k=min(3, len(items))) for category, items in TRACKABLE_ITEMS.items()
+            },
+        }
+        for user_id in range(count)
+    }
+
+
+def measure(build):
+    tracemalloc.start()
+    value = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, size
+
+
+def main():
+    user_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rng = random.Random(42)
+    records = make_records(user_count, rng)
+    payload = {
+        'timestamp': 't',
+        'data': [
+            {
+                'section': f"{category} STOCK",
+                'items': [{'name': name, 'quantity': 1} for name in rng.sample(TRACKABLE_ITEMS[category], k=4)],
+            }
+            for category in ('SEEDS', 'GEAR', 'EGG')
+        ],
+    }
+    snapshot = StockSnapshot.from_payload(payload)
+
+    # Copy through fresh containers so both sides are measured from scratch
+    lists, lists_size = measure(lambda: {
+        user_id: {
+            'tracking_enabled': data['tracking_enabled'],
+            'tracked_items': {category: list(items) for category, items in data['tracked_items'].items()},
+        }
+        for user_id, data in records.items()
+    })
+    masks, masks_size = measure(lambda: {user_id: UserState.from_dict(data) for user_id, data in records.items()})
+
+    # Both sides collect the same (name, quantity) matches the notifier sends
+    def match_lists():
+        matched = []
+        for user_data in lists.values():
+            for category, items in snapshot.items.items():
+                tracked_items = user_data['tracked_items'][category]
+                for name, quantity in items.items():
+                    if name in tracked_items:
+                        matched.append((name, quantity))
+        return len(matched)
+
+    def match_masks():
+        matched = []
+        for user_data in masks.values():
+            for category in snapshot.items:
+                matched.extend(snapshot.matches(category, user_data.mask(category)))
+        return len(matched)
+
+    assert match_lists() == match_masks()
+    runs = 5
+    lists_time = timeit.timeit(match_lists, number=runs) / runs
+    masks_time = timeit.timeit(match_masks, number=runs) / runs
+    print(f"users: {user_count}")
+    print(f"name lists: {lists_size / user_count:.0f} B/user, match {lists_time * 1000:.1f} ms")
+    print(f"bitmasks:   {masks_size / user_count:.0f} B/user, match {masks_time * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Local stand-in for the Telegram Bot API that records calls and injects faults.
+
+Point a telegram.Bot at it with base_url=f"{server.url}/bot".
+Run standalone: python bench/fake_bot_api.py --port 8081 --latency 50 --retry-after-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+
+from aiohttp import web
+
+
+class FakeBotAPI:
+    def __init__(self, latency=0.0, retry_after_rate=0.0, failure_rate=0.0, retry_after=1, seed=None):
+        self.latency = latency
+        self.retry_after_rate = retry_after_rate
+        self.failure_rate = failure_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.calls = Counter()
+        self.requests = []  # (method, params) of every call, in order
+        self.errors = Counter()
+        self.next_message_id = 1
+        self.app = web.Application()
+        self.app.router.add_post('/bot{token}/{method}', self.handle)
+        self.runner = None
+        self.url = None
+
+    async def start(self, host='127.0.0.1', port=0):
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    def reset(self):
+        self.calls.clear()
+        self.requests.clear()
+        self.errors.clear()
+
+    async def handle(self, request):
+        method = request.match_info['method']
+        params = await self._params(request)
+        self.calls[method] += 1
+        self.requests.append((method, params))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        roll = self.random.random()
+        if method != 'getMe' and roll < self.retry_after_rate:
+            self.errors['retry_after'] += 1
+            return web.json_response({
+                'ok': False,
+                'error_code': 429,
+                'description': f"Too Many Requests: retry after {self.retry_after}",
+                'parameters': {'retry_after': self.retry_after},
+            }, status=429)
+        if method != 'getMe' and roll < self.retry_after_rate + self.failure_rate:
+            self.errors['bad_request'] += 1
+            return web.json_response({
+                'ok': False, 'error_code': 400, 'description': "Bad Request: injected failure",
+            }, status=400)
+        return web.json_response({'ok': True, 'result': self._result(method, params)})
+
+    async def _params(self, request):
+        if request.content_type == 'application/json':
+            return await request.json()
+        params = {}
+        for key, value in (await request.post()).items():
+            try:
+                params[key] = json.loads(value)
+            except (TypeError, ValueError):
+                params[key] = value
+        return params
+
+    def _result(self, method, params):
+        if method == 'getMe':
+            return {'id': 1, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_bot'}
+        if method in ('sendMessage', 'editMessageText'):
+            if method == 'sendMessage':
+                message_id = self.next_message_id
+                self.next_message_id += 1
+            else:
+                message_id = params.get('message_id', 0)
+            return {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': int(params.get('chat_id', 0)), 'type': 'private'},
+                'text': params.get('text', ''),
+            }
+        return True
+
+
+async def serve(args):
+    server = FakeBotAPI(args.latency / 1000, args.retry_after_rate, args.failure_rate)
+    url = await server.start(port=args.port)
+    print(f"Fake Bot API on {url}/bot<token>/")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(dict(server.calls))
+    finally:
+        await server.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0, help='per-call latency in ms')
+    parser.add_argument('--retry-after-rate', type=float, default=0)
+    parser.add_argument('--failure-rate', type=float, default=0)
+    asyncio.run(serve(parser.parse_args()))
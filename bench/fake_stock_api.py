@@ -0,0 +1,96 @@
+"""Local stand-in for the garden stock API serving a scripted timeline.
+
+Each step of the timeline is a full stock payload. The current step is served
+with an ETag; advance() (or POST /advance) moves to the next one.
+Run standalone: python bench/fake_stock_api.py --port 8082 [--timeline steps.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from constants import TRACKABLE_ITEMS  # noqa: E402
+
+
+def random_timeline(steps, seed=None):
+    rng = random.Random(seed)
+    timeline = []
+    for step in range(steps):
+        data = []
+        for category in ('SEEDS', 'GEAR', 'EGG'):
+            items = TRACKABLE_ITEMS[category]
+            names = rng.sample(items, k=max(1, len(items) // 3))
+            data.append({
+                'section': f"{category} STOCK",
+                'items': [{'name': name, 'quantity': rng.randint(1, 10)} for name in names],
+            })
+        timeline.append({'timestamp': f"step-{step}", 'data': data})
+    return timeline
+
+
+class FakeStockAPI:
+    def __init__(self, timeline):
+        self.timeline = timeline
+        self.step = 0
+        self.requests = 0
+        self.app = web.Application()
+        self.app.router.add_get('/api/garden', self.handle)
+        self.app.router.add_post('/advance', self.handle_advance)
+        self.runner = None
+        self.url = None
+
+    async def start(self, host='127.0.0.1', port=0):
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}/api/garden"
+        return self.url
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    def advance(self):
+        self.step = min(self.step + 1, len(self.timeline) - 1)
+
+    async def handle(self, request):
+        self.requests += 1
+        etag = f'"{self.step}"'
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304)
+        return web.json_response(self.timeline[self.step], headers={'ETag': etag})
+
+    async def handle_advance(self, request):
+        self.advance()
+        return web.json_response({'step': self.step})
+
+
+async def serve(args):
+    if args.timeline:
+        with open(args.timeline) as f:
+            timeline = json.load(f)
+    else:
+        timeline = random_timeline(args.steps)
+    server = FakeStockAPI(timeline)
+    url = await server.start(port=args.port)
+    print(f"Fake stock API on {url} ({len(timeline)} steps)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8082)
+    parser.add_argument('--timeline', help='JSON file with a list of stock payloads')
+    parser.add_argument('--steps', type=int, default=12)
+    asyncio.run(serve(parser.parse_args()))
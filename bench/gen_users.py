@@ -0,0 +1,41 @@
+"""Generate a synthetic users.json.
+
+Usage: python bench/gen_users.py 10000 users.json [--items 3] [--disabled 0.1]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from constants import TRACKABLE_ITEMS  # noqa: E402
+
+
+def generate_users(count, items_per_category=3, disabled_rate=0.1, seed=None):
+    rng = random.Random(seed)
+    users = {}
+    for index in range(count):
+        user_id = str(100000000 + index)
+        users[user_id] = {
+            'tracking_enabled': rng.random() >= disabled_rate,
+            'tracked_items': {
+                category: rng.sample(items, k=rng.randint(0, min(items_per_category, len(items))))
+                for category, items in TRACKABLE_ITEMS.items()
+            },
+        }
+    return users
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('count', type=int)
+    parser.add_argument('output', nargs='?', default='users.json')
+    parser.add_argument('--items', type=int, default=3, help='max tracked items per category')
+    parser.add_argument('--disabled', type=float, default=0.1, help='share of users with tracking off')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+    with open(args.output, 'w') as f:
+        json.dump(generate_users(args.count, args.items, args.disabled, args.seed), f)
+    print(f"Wrote {args.count} users to {args.output}")
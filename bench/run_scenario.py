@@ -0,0 +1,174 @@
+"""End-to-end load scenarios against the fake Bot API and fake stock API.
+
+Scenarios:
+  ticks  - run stock ticks through fetch_stock -> process_stock_update -> dispatcher
+  taps   - fire concurrent button_handler callbacks from random users
+
+Usage:
+  python bench/run_scenario.py ticks --users 10000 --ticks 3 --rate 1000
+  python bench/run_scenario.py taps --users 10000 --taps 5000 --latency 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+
+from fake_bot_api import FakeBotAPI  # noqa: E402
+from fake_stock_api import FakeStockAPI, random_timeline  # noqa: E402
+from gen_users import generate_users  # noqa: E402
+
+
+def usage():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime, usage.ru_maxrss / 1024
+
+
+class Context:
+    def __init__(self, bot):
+        self.bot = bot
+
+
+async def setup(args):
+    workdir = tempfile.mkdtemp(prefix='garden-bench-')
+    os.chdir(workdir)
+    with open('users.json', 'w') as f:
+        json.dump(generate_users(args.users, seed=args.seed), f)
+
+    bot_api = FakeBotAPI(args.latency / 1000, args.retry_after_rate, args.failure_rate, seed=args.seed)
+    await bot_api.start()
+    stock_api = FakeStockAPI(random_timeline(args.ticks + 1, seed=args.seed))
+    await stock_api.start()
+    os.environ['DISPATCH_RATE'] = str(args.rate)
+    os.environ['PORT'] = '0'
+
+    # The bot reads its configuration at import time
+    import bot as bot_module
+    from telegram import Bot
+    from telegram.request import HTTPXRequest
+
+    telegram_bot = Bot(
+        '1:fake',
+        base_url=f"{bot_api.url}/bot",
+        request=HTTPXRequest(connection_pool_size=256),
+    )
+    await telegram_bot.initialize()
+    garden = bot_module.GardenBot()
+    garden.stock_client.url = stock_api.url
+    context = Context(telegram_bot)
+    await garden.post_init(context)
+    return bot_api, stock_api, garden, context
+
+
+async def teardown(bot_api, stock_api, garden, context):
+    await garden.post_shutdown(context)
+    await context.bot.shutdown()
+    await bot_api.stop()
+    await stock_api.stop()
+
+
+async def run_ticks(args, bot_api, stock_api, garden, context):
+    garden.last_stock = await garden.fetch_stock()
+    for tick in range(args.ticks):
+        stock_api.advance()
+        bot_api.reset()
+        cpu_before, _ = usage()
+        started = time.monotonic()
+
+        new_stock = await garden.fetch_stock()
+        await garden.process_stock_update(new_stock, context, datetime.fromtimestamp(time.time() // 300 * 300))
+        garden.last_stock = new_stock
+        fanout = time.monotonic() - started
+        await garden.dispatcher.join()
+        elapsed = time.monotonic() - started
+
+        cpu_after, peak_rss = usage()
+        stats = garden.dispatcher.last_tick.summary() if garden.dispatcher.last_tick else {}
+        print(
+            f"tick {tick + 1}: delivered in {elapsed:.2f}s (fan-out {fanout * 1000:.0f} ms), "
+            f"api calls {sum(bot_api.calls.values())} {dict(bot_api.calls)}, "
+            f"cpu {cpu_after - cpu_before:.2f}s, peak rss {peak_rss:.0f} MB, "
+            f"p50 {stats.get('p50_delay')}s p99 {stats.get('p99_delay')}s failed {stats.get('failed')}"
+        )
+
+
+async def run_taps(args, bot_api, stock_api, garden, context):
+    from telegram import Update
+
+    garden.last_stock = await garden.fetch_stock()
+    rng = random.Random(args.seed)
+    user_ids = list(garden.users)
+    choices = ['view_stock', 'config_tracking', 'category_GEAR', 'track_SEEDS_Carrot', 'main_menu']
+    updates = []
+    for index in range(args.taps):
+        user_id = int(rng.choice(user_ids))
+        updates.append(Update.de_json({
+            'update_id': index,
+            'callback_query': {
+                'id': str(index),
+                'from': {'id': user_id, 'is_bot': False, 'first_name': 'u'},
+                'chat_instance': str(user_id),
+                'data': rng.choice(choices),
+                'message': {
+                    'message_id': 1, 'date': 0, 'text': 'menu',
+                    'chat': {'id': user_id, 'type': 'private'},
+                },
+            },
+        }, context.bot))
+
+    bot_api.reset()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def tap(update):
+        async with semaphore:
+            started = time.monotonic()
+            await garden.button_handler(update, context)
+            latencies.append(time.monotonic() - started)
+
+    cpu_before, _ = usage()
+    started = time.monotonic()
+    await asyncio.gather(*(tap(update) for update in updates))
+    elapsed = time.monotonic() - started
+    cpu_after, peak_rss = usage()
+    latencies.sort()
+    print(
+        f"{args.taps} taps in {elapsed:.2f}s ({args.taps / elapsed:.0f}/s), "
+        f"p50 {latencies[len(latencies) // 2] * 1000:.1f} ms p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms, "
+        f"api calls {dict(bot_api.calls)}, cpu {cpu_after - cpu_before:.2f}s, peak rss {peak_rss:.0f} MB"
+    )
+
+
+async def main(args):
+    bot_api, stock_api, garden, context = await setup(args)
+    try:
+        if args.scenario == 'ticks':
+            await run_ticks(args, bot_api, stock_api, garden, context)
+        else:
+            await run_taps(args, bot_api, stock_api, garden, context)
+    finally:
+        await teardown(bot_api, stock_api, garden, context)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('scenario', choices=['ticks', 'taps'])
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--ticks', type=int, default=3)
+    parser.add_argument('--taps', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--rate', type=float, default=30, help='dispatcher messages per second')
+    parser.add_argument('--latency', type=float, default=0, help='fake Bot API latency in ms')
+    parser.add_argument('--retry-after-rate', type=float, default=0)
+    parser.add_argument('--failure-rate', type=float, default=0)
+    parser.add_argument('--seed', type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,126 @@
+"""Sharded mode end to end on one machine: a fetcher plus N shard worker processes.
+
+Workers are spawned exactly as with SHARDS=N and talk to the fake Bot API. This
+script plays the fetcher: it polls the fake stock API through the real fetcher
+GardenBot, publishes ticks to the shards and forwards button taps, then reports
+how long delivery took and how users are spread over the shards.
+
+Usage:
+  python bench/run_sharded.py --users 10000 --shards 4 --ticks 3 --rate 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+
+from fake_bot_api import FakeBotAPI  # noqa: E402
+from fake_stock_api import FakeStockAPI, random_timeline  # noqa: E402
+from gen_users import generate_users  # noqa: E402
+
+QUIET_PERIOD = 2.0
+
+
+async def wait_quiet(bot_api, started):
+    """Wait until the fake Bot API saw no calls for QUIET_PERIOD; returns the time of the last call"""
+    total = sum(bot_api.calls.values())
+    last_change = time.monotonic()
+    while time.monotonic() - last_change < QUIET_PERIOD:
+        await asyncio.sleep(0.1)
+        current = sum(bot_api.calls.values())
+        if current != total:
+            total, last_change = current, time.monotonic()
+    return last_change - started
+
+
+def tap_update(index, user_id, data):
+    return {
+        'update_id': index,
+        'callback_query': {
+            'id': str(index),
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'u'},
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {'message_id': 1, 'date': 0, 'text': 'menu', 'chat': {'id': user_id, 'type': 'private'}},
+        },
+    }
+
+
+async def main(args):
+    workdir = tempfile.mkdtemp(prefix='garden-shards-')
+    os.chdir(workdir)
+    users = generate_users(args.users, seed=args.seed)
+    with open('users.json', 'w') as f:
+        json.dump(users, f)
+
+    bot_api = FakeBotAPI(args.latency / 1000, seed=args.seed)
+    await bot_api.start()
+    stock_api = FakeStockAPI(random_timeline(args.ticks + 1, seed=args.seed))
+    await stock_api.start()
+    # Workers are spawned processes and read their configuration from the environment
+    os.environ.update({
+        'TELEGRAM_BOT_TOKEN': '1:fake',
+        'BOT_API_URL': f"{bot_api.url}/bot",
+        'DISPATCH_RATE': str(args.rate),
+        'PORT': '0',
+        'SHARD_PORT_BASE': '0',
+    })
+
+    import bot as bot_module
+    from sharding import ShardRouter, shard_for
+
+    spread = Counter(shard_for(user_id, args.shards) for user_id in users)
+    print(f"users per shard: {dict(sorted(spread.items()))}")
+
+    router = ShardRouter(args.shards)
+    fetcher = bot_module.GardenBot(router=router)
+    fetcher.stock_client.url = stock_api.url
+    router.start(bot_module.run_worker)
+    try:
+        while bot_api.calls['getMe'] < args.shards:
+            await asyncio.sleep(0.1)
+        fetcher.last_stock = await fetcher.fetch_stock()
+
+        for tick in range(args.ticks):
+            stock_api.advance()
+            bot_api.reset()
+            started = time.monotonic()
+            await fetcher.fetch_stock()
+            new_stock = fetcher.stock_cache.payload
+            router.broadcast(('tick', new_stock, time.time() // 300 * 300))
+            fetcher.last_stock = new_stock
+            elapsed = await wait_quiet(bot_api, started)
+            print(f"tick {tick + 1}: delivered in {elapsed:.2f}s, api calls {dict(bot_api.calls)}")
+
+        if args.taps:
+            bot_api.reset()
+            user_ids = [int(user_id) for user_id in users]
+            started = time.monotonic()
+            for index in range(args.taps):
+                user_id = user_ids[index % len(user_ids)]
+                router.forward(user_id, tap_update(index, user_id, 'view_stock'))
+            elapsed = await wait_quiet(bot_api, started)
+            print(f"{args.taps} taps handled in {elapsed:.2f}s, api calls {dict(bot_api.calls)}")
+    finally:
+        await fetcher.post_shutdown(None)
+        await bot_api.stop()
+        await stock_api.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--shards', type=int, default=4)
+    parser.add_argument('--ticks', type=int, default=3)
+    parser.add_argument('--taps', type=int, default=1000)
+    parser.add_argument('--rate', type=float, default=1000, help='total dispatcher messages per second')
+    parser.add_argument('--latency', type=float, default=0, help='fake Bot API latency in ms')
+    parser.add_argument('--seed', type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
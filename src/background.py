@@ -0,0 +1,26 @@
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+
+def single_thread_executor(name):
+    """Executor for one store's file or database access, so its writes stay ordered"""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+
+
+def log_errors(action):
+    """Done-callback logging a failed background task as "Failed to <action>: <error>" """
+    def callback(future):
+        error = future.exception()
+        if error:
+            logging.error(f"Failed to {action}: {error}")
+    return callback
+
+
+def connect_sqlite(path, schema):
+    """WAL-mode connection used from a single background thread; `schema` creates its table"""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(schema)
+    return conn
@@ -1,88 +1,311 @@
-import json
 import asyncio
-import aiohttp
+import cProfile
 import logging
 import os
+import random
+import signal
+import time
 from datetime import datetime
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
-from telegram.ext import Application, CallbackQueryHandler, CommandHandler, ContextTypes
-
-# Constants
-API_URL = "https://stock-tracker-iota-steel.vercel.app/api/garden"
-TRACKABLE_ITEMS = {
-    'SEEDS': [
-        'Carrot', 'Strawberry', 'Blueberry', 'Orange Tulip', 'Tomato',
-        'Corn', 'Daffodil', 'Watermelon', 'Pumpkin', 'Apple', 'Bamboo',
-        'Coconut', 'Cactus', 'Dragon Fruit', 'Mango', 'Grape', 'Mushroom', 'Pepper', 'Cacao'
-    ],
-    'GEAR': [
-        'Watering Can', 'Trowel', 'Recall Wrench', 'Basic Sprinkler', 'Advanced Sprinkler',
-        'Godly Sprinkler', 'Lightning Rod', 'Master Sprinkler', 'Favorite Tool'
-    ],
-    'EGG': [
-        'Common Egg', 'Uncommon Egg', 'Rare Egg', 'Legendary Egg', 'Bug Egg'
-    ],
-    'WEATHER': ['Night', '⚠️ Rain', '⚠️ Thunderstorm', '⚠️ Snow']  # Weather category
+from telegram.error import BadRequest
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, ContextTypes, TypeHandler
+
+from cache import LRUCache
+from constants import API_URL, RARITY_WEIGHTS, TRACKABLE_ITEMS
+from dispatcher import GLOBAL_RATE, NotificationDispatcher
+from events import EventScheduler
+from history import StockHistory
+from metrics import DETECTION_DELAY, FANOUT_DURATION, HANDLER_LATENCY
+from registry import NotificationRegistry
+from snapshot import StockSnapshot, diff_snapshots
+from stock_cache import CircuitOpenError, StockCache
+from stock_client import StockClient
+from sharding import SHARDS, ShardRouter, shard_for, shard_port
+from storage import USER_STORE, create_user_store
+from tracking import ITEM_BITS, UserState
+from web import WEBHOOK_PATH, WebServer
+
+# Stock rotates every 5 minutes; after a rotation the API is polled with backoff
+UPDATE_INTERVAL = 300
+POLL_FIRST_DELAY = 3
+POLL_BACKOFF = 1.5
+POLL_MAX_DELAY = 30
+POLL_WINDOW = 240
+# A fetch this soon after the boundary still returns the previous rotation
+POLL_BASELINE_GRACE = 1
+
+# Notification group -> stock categories rendered into it
+NOTIFICATION_GROUPS = {
+    'seeds_gear': ('SEEDS', 'GEAR'),
+    'egg': ('EGG',),
 }
+CATEGORY_GROUPS = {category: group for group, categories in NOTIFICATION_GROUPS.items() for category in categories}
+# Notifications expire at the next rotation of their group (eggs rotate every 30 minutes)
+EGG_INTERVAL = 1800
+GROUP_INTERVALS = {'seeds_gear': UPDATE_INTERVAL, 'egg': EGG_INTERVAL}
+# Replies to a user's own taps go ahead of the tick fan-out
+INTERACTIVE_PRIORITY = 100
 
-WEATHER_EMOJIS = {
-    'Night': '🌙',
-    'Rain': '🌧️',
-    'Thunderstorm': '⛈️',
-    'Snow': '❄️'
-}
+# Number of updates processed concurrently by PTB
+CONCURRENT_UPDATES = int(os.environ.get('CONCURRENT_UPDATES', 64))
+
+# 'polling' (default) or 'webhook'; the webhook is served by the HTTP server on port 8080
+BOT_MODE = os.environ.get('BOT_MODE', 'polling')
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL')  # Public base URL; unset to skip set_webhook when testing locally
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET')
+
+DELETE_BATCH_SIZE = 100
+
+# Share of stock ticks profiled with cProfile; profiles are written to PROFILE_DIR
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+
+# 'messages' sends one message per item, 'digest' keeps one edited message per group
+NOTIFICATION_MODE = os.environ.get('NOTIFICATION_MODE', 'messages')
+
+# Fixed callback_data values, used as handler metric labels
+CALLBACK_HANDLERS = {'none', 'main_menu', 'view_stock', 'config_tracking', 'toggle_tracking'}
+
+# Rapid track_ taps are coalesced into one save and one menu edit after the last tap,
+# but a user tapping without pause still gets a flush every TRACKING_FLUSH_MAX_DELAY seconds
+TRACKING_FLUSH_DELAY = 0.7
+TRACKING_FLUSH_MAX_DELAY = 3
+
+# Bot API server base URL, e.g. a local telegram-bot-api server or a test double
+BOT_API_URL = os.environ.get('BOT_API_URL')
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 
 class GardenBot:
-    def __init__(self):
-        self.last_stock = None
-        self.users = self.load_users()
+    def __init__(self, shard=None, router=None):
+        # Sharded mode: the fetcher process has a router and no users,
+        # every worker process owns the users of one (index, count) shard
+        self.shard = shard
+        self.router = router
+        self.last_snapshot = None
+        # Rendered views: stock text per snapshot timestamp, keyboards per (category, tracking mask)
+        self.stock_view_cache = LRUCache('stock_view', maxsize=4)
+        self.keyboard_cache = LRUCache('keyboard', maxsize=1024)
+        self.store = create_user_store()
+        self.stock_client = StockClient(API_URL)
+        # Last fetched stock, warmed from disk; last_snapshot is the stock notifications were sent for
+        self.stock_cache = StockCache(None if shard else self.stock_client).load()
+        if router:
+            self.stock_cache.on_fetch = lambda payload, fetched_at: router.broadcast(('stock', payload, fetched_at))
+        self.last_stock = self.stock_cache.payload
+        self.history = StockHistory(writable=shard is None).load()
+        self.users = {
+            user_id: UserState.from_dict(data) for user_id, data in self.store.load().items()
+            if self.owns(user_id)
+        }
         self.admin_id = os.environ.get('ADMIN_ID')  # Get admin ID from environment
         if not self.admin_id:
             logging.warning("ADMIN_ID environment variable is not set")
-        self.notification_messages = {}  # Store message IDs for each user
-        for user_id in self.users:
-            if user_id not in self.notification_messages:
-                self.notification_messages[user_id] = {'seeds_gear': [], 'egg': [], 'weather': []}
-
-    def load_users(self):
-        try:
-            with open('users.json', 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return {}
-
-    def save_users(self):
-        with open('users.json', 'w') as f:
-            json.dump(self.users, f)
+        # Message IDs of posted notifications per user and group, kept across restarts
+        self.notification_messages = NotificationRegistry().load()
+        self.dispatcher = None  # Created in post_init once the bot instance exists
+        self.web_server = None
+        # (category, item) -> set of user IDs that track the item with tracking enabled
+        self.subscribers = {}
+        # user_id -> (pending flush task, time of the first unflushed track_ tap)
+        self.tracking_flushes = {}
+        # Night and other calendar events, scheduled independently of stock polling
+        self.events = EventScheduler(self)
+        for user_id, user_data in self.users.items():
+            self.index_user(user_id, user_data)
+
+    @property
+    def last_stock(self):
+        return self.last_snapshot.payload if self.last_snapshot else None
+
+    @last_stock.setter
+    def last_stock(self, payload):
+        self.last_snapshot = StockSnapshot.from_payload(payload) if payload is not None else None
+        self.stock_view_cache.clear()
+
+    async def post_init(self, application: Application):
+        # Shard workers split the global rate limit and export their metrics on their own port
+        rate = GLOBAL_RATE / self.shard[1] if self.shard else GLOBAL_RATE
+        self.dispatcher = NotificationDispatcher(application.bot, rate=rate)
+        self.dispatcher.start()
+        if self.shard is None:
+            self.web_server = WebServer(
+                application, self, webhook_secret=WEBHOOK_SECRET if BOT_MODE == 'webhook' else None
+            )
+        else:
+            self.web_server = WebServer(application, self, port=shard_port(self.shard[0]))
+        await self.web_server.start()
+
+    async def post_shutdown(self, application: Application):
+        if self.web_server:
+            await self.web_server.stop()
+        if self.dispatcher:
+            await self.dispatcher.stop()
+        if self.router:
+            await asyncio.get_running_loop().run_in_executor(None, self.router.stop)
+        for user_id in list(self.tracking_flushes):
+            self.cancel_tracking_flush(user_id)
+        await self.stock_cache.close()
+        self.notification_messages.close()
+        self.history.close()
+        self.store.close()
+
+    def owns(self, user_id):
+        if self.router:
+            return False
+        return self.shard is None or shard_for(user_id, self.shard[1]) == self.shard[0]
+
+    async def forward_update(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Sharded mode: hand the update to the worker that owns its user"""
+        user = update.effective_user
+        self.router.forward(user.id if user else None, update.to_dict())
+
+    def receive_stock(self, payload, fetched_at):
+        """Shard workers: stock confirmed by the fetcher process"""
+        self.stock_cache.update(payload, fetched_at)
+        if self.last_stock is None:
+            self.last_stock = self.stock_cache.payload
+
+    def save_user(self, user_id):
+        str_id = str(user_id)
+        self.store.save_user(str_id, self.users[str_id].to_dict())
 
     def get_user_data(self, user_id):
         str_id = str(user_id)
         if str_id not in self.users:
-            # Add WEATHER to initial user structure
-            self.users[str_id] = {
-                'tracking_enabled': True,
-                'tracked_items': {
-                    'SEEDS': [],
-                    'GEAR': [],
-                    'EGG': [],
-                    'WEATHER': []
-                }
-            }
-            self.save_users()
-        # Check for WEATHER presence in existing users
-        elif 'WEATHER' not in self.users[str_id]['tracked_items']:
-            self.users[str_id]['tracked_items']['WEATHER'] = []
-            self.save_users()
+            self.users[str_id] = UserState()
+            self.save_user(str_id)
         return self.users[str_id]
 
-    async def fetch_stock(self):
-        async with aiohttp.ClientSession() as session:
-            async with session.get(API_URL) as response:
-                return await response.json()
+    def schedule_tracking_flush(self, user_id, query, category):
+        """Debounce track_ taps: the latest tap's query edits the menu once with the final state"""
+        str_id = str(user_id)
+        now = time.monotonic()
+        first_tap = now
+        pending = self.tracking_flushes.get(str_id)
+        if pending:
+            pending[0].cancel()
+            first_tap = pending[1]
+        delay = max(0.0, min(TRACKING_FLUSH_DELAY, first_tap + TRACKING_FLUSH_MAX_DELAY - now))
+        task = asyncio.create_task(self.flush_tracking(str_id, query, category, delay))
+        self.tracking_flushes[str_id] = (task, first_tap)
+
+    async def flush_tracking(self, user_id, query, category, delay):
+        await asyncio.sleep(delay)
+        # From here on a new tap schedules another flush instead of cancelling this one
+        self.tracking_flushes.pop(user_id, None)
+        self.save_user(user_id)
+        try:
+            await query.edit_message_text(
+                "━━━━  TRAKING SETTINGS  ━━━━\n\n"
+                "Choose your items:",
+                reply_markup=self.create_tracking_menu(user_id, category)
+            )
+        except BadRequest as e:
+            if 'not modified' not in str(e).lower():
+                logging.warning(f"Failed to update tracking menu for {user_id}: {e}")
+        except Exception as e:
+            logging.error(f"Failed to update tracking menu for {user_id}: {e}")
+
+    def cancel_tracking_flush(self, user_id):
+        """Save pending taps right away and drop their menu edit"""
+        pending = self.tracking_flushes.pop(str(user_id), None)
+        if pending:
+            pending[0].cancel()
+            self.save_user(user_id)
+
+    def index_user(self, user_id, user_data):
+        if not user_data.tracking_enabled:
+            return
+        for category in TRACKABLE_ITEMS:
+            for item in user_data.tracked(category):
+                self.subscribers.setdefault((category, item), set()).add(str(user_id))
+
+    def unindex_user(self, user_id, user_data):
+        for category in TRACKABLE_ITEMS:
+            for item in user_data.tracked(category):
+                self.unsubscribe(user_id, category, item)
+
+    def unsubscribe(self, user_id, category, item):
+        key = (category, item)
+        subscribers = self.subscribers.get(key)
+        if subscribers is None:
+            return
+        subscribers.discard(str(user_id))
+        if not subscribers:
+            del self.subscribers[key]
+
+    def queue_message(self, user_id, group=None, priority=0, deadline=None, **kwargs):
+        """Queue a notification; its message ID is remembered under `group` once sent"""
+        async def send(bot):
+            message = await bot.send_message(chat_id=user_id, **kwargs)
+            if group:
+                self.notification_messages.add(user_id, group, message.message_id)
+
+        self.dispatcher.submit(user_id, send, priority=priority, deadline=deadline)
+
+    def queue_delete(self, user_id, message_ids):
+        # deleteMessages accepts up to 100 IDs per call
+        for start in range(0, len(message_ids), DELETE_BATCH_SIZE):
+            batch = message_ids[start:start + DELETE_BATCH_SIZE]
+
+            # Failures are counted and logged at debug level by the dispatcher
+            async def delete(bot, batch=batch):
+                await bot.delete_messages(chat_id=user_id, message_ids=batch)
+
+            self.dispatcher.submit(user_id, delete, kind='delete')
+
+    def queue_digest(self, user_id, group, text, priority=0, deadline=None, **kwargs):
+        """Edit the group's notification in place, falling back to send + delete"""
+        async def send(bot):
+            message = await bot.send_message(chat_id=user_id, text=text, **kwargs)
+            self.queue_delete(user_id, self.notification_messages.take(user_id, group))
+            self.notification_messages.add(user_id, group, message.message_id)
+
+        async def edit(bot):
+            old_ids = self.notification_messages.messages(user_id, group)
+            if not old_ids:
+                self.dispatcher.submit(user_id, send, priority=priority, deadline=deadline)
+                return
+            try:
+                await bot.edit_message_text(chat_id=user_id, message_id=old_ids[-1], text=text, **kwargs)
+            except BadRequest as e:
+                if 'not modified' in str(e).lower():
+                    return
+                # Повідомлення застаре або видалене - надсилаємо нове окремим викликом
+                self.dispatcher.submit(user_id, send, priority=priority, deadline=deadline)
+                raise
+            self.queue_delete(user_id, self.notification_messages.take(user_id, group, keep_last=True))
+
+        if self.notification_messages.messages(user_id, group):
+            self.dispatcher.submit(user_id, edit, kind='edit', priority=priority, deadline=deadline)
+        else:
+            self.dispatcher.submit(user_id, send, priority=priority, deadline=deadline)
+
+    def replace_notifications(self, user_id, group, notifications, deadline=None, **kwargs):
+        """Replace the group's notifications with `notifications`, a list of (text, priority)"""
+        if NOTIFICATION_MODE == 'digest' and notifications:
+            text = "\n".join(text for text, _ in notifications)
+            priority = max(priority for _, priority in notifications)
+            self.queue_digest(user_id, group, text, priority=priority, deadline=deadline, **kwargs)
+            return
+
+        self.queue_delete(user_id, self.notification_messages.take(user_id, group))
+        for text, priority in notifications:
+            self.queue_message(user_id, group=group, text=text, priority=priority, deadline=deadline, **kwargs)
 
-    def create_main_menu(self):
-        user_data = self.get_user_data(self.current_user_id)
-        tracking_status = "🟢 Tracking ON" if user_data['tracking_enabled'] else "🔴 Tracking OFF"
+    async def fetch_stock(self, conditional=True):
+        """Returns None when the API reports the stock as not modified"""
+        return await self.stock_cache.fetch(conditional=conditional)
+
+    def create_main_menu(self, user_id):
+        user_data = self.get_user_data(user_id)
+        tracking_enabled = user_data.tracking_enabled
+        return self.keyboard_cache.get_or_create(
+            ('main_menu', tracking_enabled), lambda: self.build_main_menu(tracking_enabled)
+        )
+
+    def build_main_menu(self, tracking_enabled):
+        tracking_status = "🟢 Tracking ON" if tracking_enabled else "🔴 Tracking OFF"
         
         keyboard = [
             [InlineKeyboardButton("🔍 View Current Stock", callback_data="view_stock")],
@@ -93,28 +316,41 @@ class GardenBot:
 
     def create_stock_view(self, stock_data):
         timestamp = stock_data.get('timestamp', 'unknown time')
-        text = ""
-        
-        # Add warning if stock might be outdated
-        current_minute = datetime.now().minute
-        is_update_time = current_minute % 5 == 0 or current_minute % 30 == 0
-        
-        if is_update_time:
-            text += "⚠️ WARNING: Stock data might be outdated!\n\n"
-        
-        text += f"Current Stock (from {timestamp}):\n\n"
+        text, markup = self.stock_view_cache.get_or_create(
+            timestamp, lambda: self.build_stock_view(stock_data)
+        )
+
+        age = self.stock_cache.age()
+        if age is not None:
+            updated = f"{int(age // 60)} min ago" if age >= 60 else "just now"
+            text = f"🕒 Updated {updated}\n" + text
+        # Add warning if a rotation happened since the stock was last confirmed
+        if self.stock_cache.is_stale():
+            text = "⚠️ WARNING: Stock data might be outdated, refreshing...\n\n" + text
+        return text, markup
+
+    def build_stock_view(self, stock_data):
+        timestamp = stock_data.get('timestamp', 'unknown time')
+        lines = [f"Current Stock (from {timestamp}):", ""]
         for section in stock_data['data']:
-            text += f"📦 {section['section']}:\n"
+            lines.append(f"📦 {section['section']}:")
             for item in section['items']:
-                text += f"• {item['name']} - {item['quantity']}\n"
-            text += "\n"
+                lines.append(f"• {item['name']} - {item['quantity']}")
+            lines.append("")
         
         keyboard = [[InlineKeyboardButton("« Back", callback_data="main_menu"),
                     InlineKeyboardButton("↻ Refresh", callback_data="view_stock")]]
-        return text, InlineKeyboardMarkup(keyboard)
+        return "\n".join(lines) + "\n", InlineKeyboardMarkup(keyboard)
+
+    def create_tracking_menu(self, user_id, category):
+        user_data = self.get_user_data(user_id)
+        mask = user_data.mask(category)
+        return self.keyboard_cache.get_or_create(
+            (category, mask), lambda: self.build_tracking_menu(category, mask)
+        )
 
-    def create_tracking_menu(self, category):
-        user_data = self.get_user_data(self.current_user_id)
+    def build_tracking_menu(self, category, mask):
+        bits = ITEM_BITS[category]
         keyboard = []
         
         if category == 'WEATHER':
@@ -123,7 +359,7 @@ class GardenBot:
             for item in TRACKABLE_ITEMS['WEATHER']:
                 if '⚠️' in item or item == 'Night':
                     current_row.append(InlineKeyboardButton(
-                        item if '⚠️' in item else f"{'✅' if item in user_data['tracked_items']['WEATHER'] else '❌'} {item}",
+                        item if '⚠️' in item else f"{'✅' if mask & bits[item] else '❌'} {item}",
                         callback_data=f"track_WEATHER_{item}" if item == 'Night' else "none"
                     ))
                 
@@ -144,7 +380,7 @@ class GardenBot:
             # Regular category menu (SEEDS/GEAR/EGG)
             current_row = []
             for item in TRACKABLE_ITEMS[category]:
-                status = "✅" if item in user_data['tracked_items'][category] else "❌"
+                status = "✅" if mask & bits[item] else "❌"
                 current_row.append(InlineKeyboardButton(
                     f"{status} {item}",
                     callback_data=f"track_{category}_{item}"
@@ -176,7 +412,6 @@ class GardenBot:
         return InlineKeyboardMarkup(keyboard)
 
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        self.current_user_id = update.effective_user.id
         await update.message.reply_text(
             "Welcome to Garden Stock Tracker! 🌱\n\n"
             "Features:\n"
@@ -188,32 +423,51 @@ class GardenBot:
         )
 
     async def menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        self.current_user_id = update.effective_user.id
+        user_id = update.effective_user.id
         await update.message.reply_text(
             "━━━━━ MENU ━━━━━\n\n"
             "Choose an option:",
-            reply_markup=self.create_main_menu()
+            reply_markup=self.create_main_menu(user_id)
         )
 
     async def button_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        data = update.callback_query.data or ''
+        if data.startswith(('category_', 'track_')):
+            handler = data.split('_', 1)[0]
+        else:
+            # Callback data comes from the client, so unknown values share one label
+            handler = data if data in CALLBACK_HANDLERS else 'other'
+        started = time.monotonic()
+        try:
+            await self.handle_button(update, context)
+        finally:
+            HANDLER_LATENCY.labels(handler).observe(time.monotonic() - started)
+
+    async def handle_button(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
-        self.current_user_id = query.from_user.id
+        user_id = query.from_user.id
         await query.answer()
 
         if query.data == "none":
             return
+        if not query.data.startswith("track_"):
+            # This button re-renders the message, so a pending tracking menu edit must not follow it
+            self.cancel_tracking_flush(user_id)
 
         if query.data == "main_menu":
             await query.edit_message_text(
                 "━━━━━ MENU ━━━━━\n\n"
                 "Choose an option:",
-                reply_markup=self.create_main_menu()
+                reply_markup=self.create_main_menu(user_id)
             )
             return
 
         if query.data == "view_stock":
-            if self.last_stock:
-                text, markup = self.create_stock_view(self.last_stock)
+            # Serve the cached stock right away and refresh it in the background if needed
+            if self.stock_cache.is_stale():
+                self.stock_cache.revalidate()
+            if self.stock_cache.payload:
+                text, markup = self.create_stock_view(self.stock_cache.payload)
                 await query.edit_message_text(
                     "━━━━━━ STOCK ━━━━━━\n\n" + text,
                     reply_markup=markup
@@ -221,14 +475,14 @@ class GardenBot:
             else:
                 await query.edit_message_text(
                     "Loading stock data...",
-                    reply_markup=self.create_main_menu()
+                    reply_markup=self.create_main_menu(user_id)
                 )
 
         elif query.data == "config_tracking":
             await query.edit_message_text(
                 "━━━━  TRAKING SETTINGS  ━━━━\n\n"
                 "Choose your items:",
-                reply_markup=self.create_tracking_menu("SEEDS")
+                reply_markup=self.create_tracking_menu(user_id, "SEEDS")
             )
 
         elif query.data.startswith("category_"):
@@ -236,215 +490,301 @@ class GardenBot:
             await query.edit_message_text(
                 "━━━━  TRAKING SETTINGS  ━━━━\n\n"
                 "Choose your items:",
-                reply_markup=self.create_tracking_menu(category)
+                reply_markup=self.create_tracking_menu(user_id, category)
             )
 
         elif query.data.startswith("track_"):
             _, category, item = query.data.split("_", 2)
-            user_data = self.get_user_data(self.current_user_id)
-            if item in user_data['tracked_items'][category]:
-                user_data['tracked_items'][category].remove(item)
-            else:
-                user_data['tracked_items'][category].append(item)
-            self.save_users()
-            await query.edit_message_text(
-                "━━━━  TRAKING SETTINGS  ━━━━\n\n"
-                "Choose your items:",
-                reply_markup=self.create_tracking_menu(category)
-            )
+            # No await between reading and updating the user's state, so concurrent
+            # updates of the same user cannot interleave here and no lock is needed
+            user_data = self.get_user_data(user_id)
+            if not user_data.toggle(category, item):
+                self.unsubscribe(user_id, category, item)
+            elif user_data.tracking_enabled:
+                self.subscribers.setdefault((category, item), set()).add(str(user_id))
+            # The change is live right away; saving and the menu edit wait for the taps to settle
+            self.schedule_tracking_flush(user_id, query, category)
 
         elif query.data == "toggle_tracking":
-            user_data = self.get_user_data(self.current_user_id)
-            was_enabled = user_data['tracking_enabled']
-            user_data['tracking_enabled'] = not was_enabled
-            self.save_users()
+            # Like track_, the toggle and re-index run without an await in between
+            user_data = self.get_user_data(user_id)
+            was_enabled = user_data.tracking_enabled
+            user_data.tracking_enabled = not was_enabled
+            if user_data.tracking_enabled:
+                self.index_user(user_id, user_data)
+            else:
+                self.unindex_user(user_id, user_data)
+            self.save_user(user_id)
 
             # Якщо трекінг включили і є збережений сток
-            if not was_enabled and user_data['tracking_enabled'] and self.last_stock:
+            if not was_enabled and user_data.tracking_enabled and self.last_snapshot:
                 # Збираємо всі доступні предмети
                 available_items = []
-                for section in self.last_stock['data']:
-                    category = section['section'].split()[0]
-                    tracked_items = user_data['tracked_items'][category]
-                    
-                    for item in section['items']:
-                        if item['name'] in tracked_items:
-                            available_items.append({
-                                'name': item['name'],
-                                'category': category,
-                                'quantity': item['quantity']
-                            })
+                for category in self.last_snapshot.items:
+                    for name, quantity in self.last_snapshot.matches(category, user_data.mask(category)):
+                        available_items.append({
+                            'name': name,
+                            'category': category,
+                            'quantity': quantity
+                        })
                 
-                # Відправляємо повідомлення по одному з невеликою затримкою
+                # Ставимо повідомлення в чергу диспетчера
                 if available_items:
-                    await context.bot.send_message(
-                        chat_id=query.from_user.id,
+                    self.queue_message(
+                        query.from_user.id,
+                        priority=INTERACTIVE_PRIORITY,
                         text="🔔 Currently available tracked items:"
                     )
                     
                     for item in available_items:
-                        await context.bot.send_message(
-                            chat_id=query.from_user.id,
+                        self.queue_message(
+                            query.from_user.id,
+                            priority=INTERACTIVE_PRIORITY,
                             text=f"✅ {item['name']} in {item['category']} - {item['quantity']} (currently available)"
                         )
-                        await asyncio.sleep(0.1)  # Зменшена затримка
 
             # Оновлюємо меню
             await query.edit_message_text(
                 "━━━━━ MENU ━━━━━\n\n"
                 "Choose an option:",
-                reply_markup=self.create_main_menu()
+                reply_markup=self.create_main_menu(user_id)
             )
 
-    async def check_stock_updates(self, context: Application):
-        while True:
+    def schedule_stock_updates(self, job_queue):
+        # Align the repeating job to wall-clock 5-minute boundaries
+        first = UPDATE_INTERVAL - time.time() % UPDATE_INTERVAL
+        job_queue.run_repeating(
+            self.check_stock_updates,
+            interval=UPDATE_INTERVAL,
+            first=first,
+            name='stock_updates',
+            job_kwargs={'misfire_grace_time': 60, 'coalesce': True, 'max_instances': 1}
+        )
+        # Initial fetch so the stock view has data before the first boundary
+        job_queue.run_once(self.initial_stock_check, when=0, name='initial_stock')
+
+    async def initial_stock_check(self, context: ContextTypes.DEFAULT_TYPE):
+        """Single fetch at startup; later rotations are left to the aligned job"""
+        try:
+            await self.fetch_stock()
+        except Exception as e:
+            logging.error(f"Initial stock fetch failed: {e}")
+            return
+        new_stock = self.stock_cache.payload
+        if new_stock is None:
+            return
+        boundary_ts = time.time() // UPDATE_INTERVAL * UPDATE_INTERVAL
+        if self.last_stock is None:
+            self.last_stock = new_stock
+            self.history.append(self.last_snapshot, boundary_ts)
+            logging.info("First run - saving initial stock")
+        elif new_stock.get('timestamp') != self.last_stock.get('timestamp'):
+            # The stock rotated while the bot was down: this is the current rotation
+            logging.info(f"Stock changed since the last run, applying {new_stock.get('timestamp')}")
+            await self.publish_stock(new_stock, context, boundary_ts)
+
+    async def check_stock_updates(self, context: ContextTypes.DEFAULT_TYPE):
+        now = time.time() + 1  # Tolerate the job firing a moment before the boundary
+        update_time = datetime.fromtimestamp(now // UPDATE_INTERVAL * UPDATE_INTERVAL)
+        started = time.monotonic()
+        # Never poll into the next window: a rotation seen there belongs to the next job
+        window = min(POLL_WINDOW, UPDATE_INTERVAL - now % UPDATE_INTERVAL)
+        delay = POLL_FIRST_DELAY
+        attempt = 0
+        logging.info(f"Scheduled update check for {update_time.strftime('%H:%M')}")
+        baseline = await self.stock_baseline(update_time.timestamp())
+
+        while time.monotonic() - started + delay <= window:
+            await asyncio.sleep(delay)
+            delay = min(delay * POLL_BACKOFF, POLL_MAX_DELAY)
+            attempt += 1
+
             try:
-                now = datetime.now()
-                current_minute = now.minute
-                
-                # Перевірка чи це час оновлення (кожні 5 хвилин)
-                if current_minute % 5 == 0 and now.second == 0:
-                    logging.info(f"Scheduled update check at {now.strftime('%H:%M:%S')}")
-                    
-                    # Робимо 3 спроби перевірки з інтервалом 30 секунд
-                    for attempt in range(3):
-                        await asyncio.sleep(30)
-                        check_time = datetime.now()
-                        logging.info(f"Update attempt {attempt + 1} at {check_time.strftime('%H:%M:%S')}")
-                        
-                        new_stock = await self.fetch_stock()
-                        
-                        # Якщо це перший запуск - зберігаємо сток і чекаємо наступного оновлення
-                        if self.last_stock is None:
-                            self.last_stock = new_stock
-                            logging.info("First run - saving initial stock")
-                            break
-                            
-                        # Порівнюємо весь сток цілком
-                        if new_stock != self.last_stock:
-                            logging.info("Stock update detected")
-                            # Перевіряємо чи змінився timestamp
-                            if new_stock.get('timestamp') != self.last_stock.get('timestamp'):
-                                await self.process_stock_update(new_stock, context, check_time)
-                                self.last_stock = new_stock
-                                break
-                            else:
-                                logging.info("Same timestamp, ignoring update")
-                        
-                        if attempt < 2:
-                            logging.info("No changes, waiting for next attempt")
-                        else:
-                            logging.info("No changes after all attempts")
-                
-                await asyncio.sleep(1)
-                
+                await self.fetch_stock()
+            except CircuitOpenError as e:
+                logging.debug(f"Skipping stock poll: {e}")
+                continue
             except Exception as e:
-                logging.error(f"Error in stock update: {e}")
-                await asyncio.sleep(60)
+                logging.error(f"Error in stock update (attempt {attempt}): {e}")
+                continue
+            # Compare the cached stock rather than the response: a background revalidation
+            # may already have fetched the new stock, leaving this request a 304
+            new_stock = self.stock_cache.payload
+            if new_stock is None:
+                continue
 
-    async def process_stock_update(self, new_stock, context: Application, update_time):
-        if not self.last_stock:
+            # Boundary of the rotation, taken at detection time
+            boundary_ts = time.time() // UPDATE_INTERVAL * UPDATE_INTERVAL
+
+            # Якщо це перший запуск - зберігаємо сток і чекаємо наступного оновлення
+            if self.last_stock is None:
+                self.last_stock = new_stock
+                self.history.append(self.last_snapshot, boundary_ts)
+                logging.info("First run - saving initial stock")
+                return
+
+            # Новий сток визначається за зміною timestamp; сток з межі ротації ще старий
+            timestamp = new_stock.get('timestamp')
+            if timestamp != self.last_stock.get('timestamp') and timestamp != baseline:
+                logging.info(
+                    f"Stock update detected after {time.monotonic() - started:.1f}s (attempt {attempt})"
+                )
+                DETECTION_DELAY.observe(time.time() - boundary_ts)
+                await self.publish_stock(new_stock, context, boundary_ts)
+                return
+
+        logging.info(f"No stock change detected after {attempt} attempts")
+
+    async def stock_baseline(self, boundary_ts):
+        """Timestamp of the rotation before the boundary, or None when the job fired too late to tell.
+
+        A rotation that went unnoticed (API later than the poll window, an outage,
+        a restart) is taken over here without notifying, so the new rotation is
+        not mistaken for it and the bot does not stay one rotation behind.
+        """
+        if time.time() - boundary_ts > POLL_BASELINE_GRACE:
+            return None
+        if self.stock_cache.fetched_at is None or self.stock_cache.fetched_at < boundary_ts:
+            try:
+                await self.fetch_stock()
+            except Exception as e:
+                logging.warning(f"Stock fetch at the boundary failed: {e}")
+        stock = self.stock_cache.payload
+        if stock is None:
+            return None
+        if self.last_stock is not None and stock.get('timestamp') != self.last_stock.get('timestamp'):
+            logging.info(f"Catching up with missed stock {stock.get('timestamp')}")
+            self.adopt_stock(stock, boundary_ts - UPDATE_INTERVAL)
+        return stock.get('timestamp')
+
+    def adopt_stock(self, new_stock, boundary_ts):
+        """Record a stock as seen without notifying anyone"""
+        self.last_stock = new_stock
+        self.history.append(self.last_snapshot, boundary_ts)
+        if self.router:
+            self.router.broadcast(('saved', new_stock))
+
+    async def publish_stock(self, new_stock, context, boundary_ts):
+        """Notify users of a new rotation and record it"""
+        if self.router:
+            # Shard workers match and notify their own users
+            self.router.broadcast(('tick', new_stock, boundary_ts))
+            self.last_stock = new_stock
+            self.history.append(self.last_snapshot, boundary_ts)
+        else:
+            await self.apply_stock_update(new_stock, context, boundary_ts)
+
+    async def apply_stock_update(self, new_stock, context, boundary_ts):
+        update_time = datetime.fromtimestamp(boundary_ts)
+        profiler = None
+        if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        fanout_started = time.monotonic()
+        await self.process_stock_update(new_stock, context, update_time)
+        FANOUT_DURATION.observe(time.monotonic() - fanout_started)
+        if profiler:
+            profiler.disable()
+            self.save_profile(profiler, update_time)
+
+        self.last_stock = new_stock
+        self.history.append(self.last_snapshot, boundary_ts)
+
+    def save_profile(self, profiler, update_time):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        suffix = f"-shard{self.shard[0]}" if self.shard else ''
+        path = os.path.join(PROFILE_DIR, f"tick-{update_time.strftime('%Y%m%d-%H%M')}{suffix}.prof")
+        profiler.dump_stats(path)
+        logging.info(f"Saved tick profile to {path}")
+
+    async def process_stock_update(self, new_stock, context: ContextTypes.DEFAULT_TYPE, update_time):
+        if not self.last_snapshot:
             self.last_stock = new_stock
             return
 
-        current_minute = update_time.minute
-        current_hour = update_time.hour
-        is_egg_update = current_minute in [0, 30]  # Перевіряємо чи це точний час для EGG
-        is_night_warning = current_minute == 55
-        is_night_start = current_minute == 0
+        snapshot = StockSnapshot.from_payload(new_stock)
+        diff = diff_snapshots(self.last_snapshot, snapshot)
 
-        # Для кожного користувача
-        for user_id, user_data in self.users.items():
-            if not user_data['tracking_enabled']:
+        # Користувачі, яких стосуються зміни, по групах повідомлень
+        group_users = {}
+        for category, changes in diff.items():
+            group = CATEGORY_GROUPS.get(category)
+            if group is None:
                 continue
-
-            str_user_id = str(user_id)
-            
-            # Видаляємо старі повідомлення для SEEDS і GEAR
-            if str_user_id in self.notification_messages:
-                for msg_id in self.notification_messages[str_user_id].get('seeds_gear', []):
-                    try:
-                        await context.bot.delete_message(chat_id=user_id, message_id=msg_id)
-                    except Exception:
-                        pass  # Ігноруємо помилки при видаленні
-                # Очищаємо список повідомлень для SEEDS і GEAR
-                self.notification_messages[str_user_id]['seeds_gear'] = []
-
-            # Видаляємо старі повідомлення для EGG якщо це час оновлення EGG
-            if is_egg_update and str_user_id in self.notification_messages:
-                for msg_id in self.notification_messages[str_user_id].get('egg', []):
-                    try:
-                        await context.bot.delete_message(chat_id=user_id, message_id=msg_id)
-                    except Exception:
-                        pass
-                # Очищаємо список повідомлень для EGG
-                self.notification_messages[str_user_id]['egg'] = []
-
-            # Ініціалізуємо структуру для нових повідомлень
-            if str_user_id not in self.notification_messages:
-                self.notification_messages[str_user_id] = {'seeds_gear': [], 'egg': [], 'weather': []}
-
-            # Відправляємо нові повідомлення
-            for section in new_stock['data']:
-                category = section['section'].split()[0]
-                
-                # Пропускаємо EGG якщо це не час оновлення
-                if category == 'EGG' and not is_egg_update:
-                    continue
-                
-                tracked_items = user_data['tracked_items'][category]
-                if not tracked_items:
+            users = group_users.setdefault(group, set())
+            for name in changes.names():
+                users.update(self.subscribers.get((category, name), ()))
+        # Posted alerts in a changed group are re-rendered too, so alerts for items
+        # the user stopped tracking get deleted
+        for group, users in group_users.items():
+            users.update(self.notification_messages.users_in(group))
+
+        boundary_ts = update_time.timestamp() // UPDATE_INTERVAL * UPDATE_INTERVAL
+        deadlines = {
+            group: (boundary_ts // interval + 1) * interval for group, interval in GROUP_INTERVALS.items()
+        }
+
+        self.notification_messages.maybe_prune()
+        self.dispatcher.begin_tick(snapshot.timestamp or update_time.strftime('%H:%M'))
+        # Lines depend only on which tracked items are in stock, so users with the same ones share them
+        rendered = {}
+        for group, user_ids in group_users.items():
+            categories = NOTIFICATION_GROUPS[group]
+            # Перемальовуємо лише групи, в яких змінились відстежувані предмети
+            for user_id in user_ids:
+                user_data = self.users.get(user_id)
+                if not user_data or not user_data.tracking_enabled:
                     continue
 
-                for item in section['items']:
-                    if item['name'] in tracked_items:
-                        try:
-                            message = await context.bot.send_message(
-                                chat_id=user_id,
-                                text=f"✅ {item['name']} in {category} - {item['quantity']}"
-                            )
-                            # Зберігаємо ID повідомлення
-                            if category == 'EGG':
-                                self.notification_messages[str_user_id]['egg'].append(message.message_id)
-                            else:
-                                self.notification_messages[str_user_id]['seeds_gear'].append(message.message_id)
-                            
-                            await asyncio.sleep(0.1)  # Зменшена затримка
-                        except Exception as e:
-                            logging.error(f"Failed to send notification: {e}")
-
-            # Handle Night event
-            tracked_weather = user_data['tracked_items'].get('WEATHER', [])
-            if 'Night' in tracked_weather:
-                if is_night_warning:
-                    try:
-                        message = await context.bot.send_message(
-                            chat_id=user_id,
-                            parse_mode='HTML',
-                            text=f"🌙 <b>Night</b> event starts in 5 minutes!"
-                        )
-                        self.notification_messages[str_user_id]['weather'].append(message.message_id)
-                    except Exception as e:
-                        logging.error(f"Failed to send night warning: {e}")
-                
-                elif is_night_start:
-                    # Clear old weather messages
-                    for msg_id in self.notification_messages[str_user_id]['weather']:
-                        try:
-                            await context.bot.delete_message(chat_id=user_id, message_id=msg_id)
-                        except Exception:
-                            pass
-                    self.notification_messages[str_user_id]['weather'] = []
-                    
-                    try:
-                        message = await context.bot.send_message(
-                            chat_id=user_id,
-                            parse_mode='HTML',
-                            text=f"🌙 Event <b>Night</b> started!"
-                        )
-                        self.notification_messages[str_user_id]['weather'].append(message.message_id)
-                    except Exception as e:
-                        logging.error(f"Failed to send night start: {e}")
+                key = (group, tuple(
+                    user_data.mask(category) & snapshot.masks.get(category, 0) for category in categories
+                ))
+                lines = rendered.get(key)
+                if lines is None:
+                    lines = rendered[key] = [
+                        (f"✅ {name} in {category} - {quantity}", RARITY_WEIGHTS.get(name, 0))
+                        for category, hit in zip(categories, key[1])
+                        for name, quantity in snapshot.matches(category, hit)
+                    ]
+                self.replace_notifications(user_id, group, lines, deadline=deadlines[group])
+        self.dispatcher.end_tick()
+
+    async def history_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = " ".join(context.args or [])
+        if not query:
+            await update.message.reply_text("Usage: /history <item>, e.g. /history Legendary Egg")
+            return
+
+        stats = await self.history.item_stats(query)
+        if stats is None:
+            await update.message.reply_text(f"No history for \"{query}\" yet")
+            return
+
+        lines = [f"📈 {stats['name']} ({stats['category']})", ""]
+        if 'last_seen' in stats:
+            last_seen = datetime.fromtimestamp(stats['last_seen'])
+            lines.append(f"Last seen: {last_seen.strftime('%Y-%m-%d %H:%M')} - {stats['last_quantity']}")
+        for label, (seen, total) in stats['windows'].items():
+            if total:
+                lines.append(f"Last {label}: in {seen} of {total} restocks ({seen / total:.0%})")
+        if stats['first_snapshot']:
+            since = datetime.fromtimestamp(stats['first_snapshot']).strftime('%Y-%m-%d')
+            lines.append(f"Total: {stats['appearances']} appearances since {since}")
+        await update.message.reply_text("\n".join(lines))
+
+    async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        snapshots, top = await self.history.top_items()
+        if not snapshots:
+            await update.message.reply_text("No stock history for the last 24h yet")
+            return
+
+        lines = [f"📊 Most frequent items, last 24h ({snapshots} restocks)", ""]
+        for category, items in top.items():
+            lines.append(f"📦 {category}:")
+            for name, count in items:
+                lines.append(f"• {name} - {count / snapshots:.0%}")
+            lines.append("")
+        await update.message.reply_text("\n".join(lines))
 
     async def force_save_stock(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Admin command to force save current stock"""
@@ -454,42 +794,138 @@ class GardenBot:
             await update.message.reply_text("⛔ Access denied")
             return
             
-        try:
-            new_stock = await self.fetch_stock()
-            self.last_stock = new_stock
-            await update.message.reply_text(
-                f"✅ Stock saved successfully!\n"
-                f"Timestamp: {new_stock.get('timestamp', 'unknown')}"
-            )
-            logging.info(f"Stock forcefully saved by admin at {datetime.now().strftime('%H:%M:%S')}")
-        except Exception as e:
-            await update.message.reply_text(f"❌ Error: {str(e)}")
-            logging.error(f"Error in force_save_stock: {e}")
+        # Save what the cache holds now; a fresher stock, if any, arrives via background revalidation
+        self.stock_cache.revalidate()
+        new_stock = self.stock_cache.payload
+        if new_stock is None:
+            await update.message.reply_text("❌ Error: no stock data cached yet, try again shortly")
+            return
 
-def main():
-    bot = GardenBot()
-    token = os.environ.get('TELEGRAM_BOT_TOKEN')
-    if not token:
-        raise ValueError("TELEGRAM_BOT_TOKEN environment variable is not set")
-    
-    application = Application.builder().token(token).build()
+        self.last_stock = new_stock
+        self.stock_cache.save()
+        if self.router:
+            self.router.broadcast(('saved', new_stock))
+        age = self.stock_cache.age()
+        await update.message.reply_text(
+            f"✅ Stock saved successfully!\n"
+            f"Timestamp: {new_stock.get('timestamp', 'unknown')}\n"
+            f"Age: {int(age) if age is not None else 'unknown'}s"
+        )
+        logging.info(f"Stock forcefully saved by admin at {datetime.now().strftime('%H:%M:%S')}")
+
+async def run_webhook(application: Application, bot: GardenBot):
+    async with application:
+        await bot.post_init(application)
+        if WEBHOOK_URL:
+            await application.bot.set_webhook(
+                url=WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES
+            )
+        await application.start()
+        logging.info("Running in webhook mode")
+
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+        await stop_event.wait()
+
+        await application.stop()
+        await bot.post_shutdown(application)
+
+def run_worker(index, count, channel):
+    """Entry point of a shard worker process (sharded mode)"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The fetcher stops workers through the channel
+    logging.basicConfig(format=LOG_FORMAT.replace('%(name)s', f'shard{index} %(name)s'), level=logging.INFO)
+    asyncio.run(serve_shard(index, count, channel))
+
+async def serve_shard(index, count, channel):
+    bot = GardenBot(shard=(index, count))
+    application = build_application(bot, os.environ['TELEGRAM_BOT_TOKEN'])
+    register_handlers(application, bot)
+    logging.info(f"Shard {index}/{count} serving {len(bot.users)} users")
+
+    async with application:
+        await bot.post_init(application)
+        bot.events.schedule(application.job_queue)
+        await application.start()
+
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await loop.run_in_executor(None, channel.get)
+            if message is None:
+                break
+            kind = message[0]
+            try:
+                if kind == 'update':
+                    await application.update_queue.put(Update.de_json(message[1], application.bot))
+                elif kind == 'stock':
+                    bot.receive_stock(message[1], message[2])
+                elif kind == 'tick':
+                    await bot.apply_stock_update(message[1], None, message[2])
+                elif kind == 'saved':
+                    bot.last_stock = message[1]
+            except Exception as e:
+                logging.error(f"Error handling {kind} message: {e}")
+
+        await application.stop()
+        await bot.post_shutdown(application)
+
+def build_application(bot, token):
+    builder = (
+        Application.builder()
+        .token(token)
+        .post_init(bot.post_init)
+        .post_shutdown(bot.post_shutdown)
+        .concurrent_updates(CONCURRENT_UPDATES)
+    )
+    if BOT_API_URL:
+        builder = builder.base_url(BOT_API_URL)
+    return builder.build()
 
+def register_handlers(application, bot):
     application.add_handler(CommandHandler("start", bot.start))
     application.add_handler(CommandHandler("menu", bot.menu))
-    application.add_handler(CommandHandler("save_stock", bot.force_save_stock))  # New handler
+    if bot.shard is None:
+        # Shard workers neither fetch nor own last_stock.json; the fetcher handles /save_stock
+        application.add_handler(CommandHandler("save_stock", bot.force_save_stock))  # New handler
+    application.add_handler(CommandHandler("history", bot.history_command))
+    application.add_handler(CommandHandler("stats", bot.stats_command))
     application.add_handler(CallbackQueryHandler(bot.button_handler))
-    
-    # Start the stock update loop
-    application.job_queue.run_once(
-        lambda ctx: asyncio.create_task(bot.check_stock_updates(ctx)),
-        when=0
-    )
 
-    application.run_polling()
+def main():
+    token = os.environ.get('TELEGRAM_BOT_TOKEN')
+    if not token:
+        raise ValueError("TELEGRAM_BOT_TOKEN environment variable is not set")
+    if BOT_MODE == 'webhook' and not WEBHOOK_SECRET:
+        raise ValueError("WEBHOOK_SECRET environment variable is required in webhook mode")
+    if SHARDS > 1 and USER_STORE != 'sqlite':
+        raise ValueError("Sharded mode requires USER_STORE=sqlite")
+
+    # In sharded mode this process only fetches stock and routes updates to the workers.
+    # The bot is created before the workers start, so users.json is migrated only once
+    router = ShardRouter(SHARDS) if SHARDS > 1 else None
+    bot = GardenBot(router=router)
+    application = build_application(bot, token)
+
+    if router:
+        router.start(run_worker)
+        # /save_stock changes the fetcher's state, everything else belongs to a user's shard
+        application.add_handler(CommandHandler("save_stock", bot.force_save_stock))
+        application.add_handler(TypeHandler(Update, bot.forward_update))
+    else:
+        register_handlers(application, bot)
+        bot.events.schedule(application.job_queue)
+
+    # Start the stock update scheduler
+    bot.schedule_stock_updates(application.job_queue)
+
+    if BOT_MODE == 'webhook':
+        asyncio.run(run_webhook(application, bot))
+    else:
+        application.run_polling()
 
 if __name__ == '__main__':
-    logging.basicConfig(
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        level=logging.INFO
-    )
+    logging.basicConfig(format=LOG_FORMAT, level=logging.INFO)
     main()
\ No newline at end of file
@@ -0,0 +1,40 @@
+from collections import OrderedDict
+
+from metrics import VIEW_CACHE_LOOKUPS
+
+
+class LRUCache:
+    def __init__(self, name, maxsize=256):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = VIEW_CACHE_LOOKUPS.labels(name, 'hit')
+        self.misses = VIEW_CACHE_LOOKUPS.labels(name, 'miss')
+
+    def get(self, key):
+        try:
+            value = self.data[key]
+        except KeyError:
+            self.misses.inc()
+            return None
+        self.data.move_to_end(key)
+        self.hits.inc()
+        return value
+
+    def put(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def get_or_create(self, key, factory):
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        self.data.clear()
+
+    def __len__(self):
+        return len(self.data)
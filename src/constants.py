@@ -1,5 +1,11 @@
+import json
+import os
+
 # Constants
-API_URL = "https://stock-tracker-iota-steel.vercel.app/api/garden"
+API_URL = os.environ.get('API_URL', "https://stock-tracker-iota-steel.vercel.app/api/garden")
+
+# Item order is significant: positions are used as bit numbers for tracking masks,
+# so new items must be appended to the end of their category
 TRACKABLE_ITEMS = {
     'SEEDS': [
         'Carrot', 'Strawberry', 'Blueberry', 'Orange Tulip', 'Tomato',
@@ -12,5 +18,31 @@ TRACKABLE_ITEMS = {
     ],
     'EGG': [
         'Common Egg', 'Uncommon Egg', 'Rare Egg', 'Legendary Egg', 'Bug Egg'
-    ]
-}
\ No newline at end of file
+    ],
+    'WEATHER': ['Night', '⚠️ Rain', '⚠️ Thunderstorm', '⚠️ Snow']  # Weather category
+}
+
+# Notification priority per item: rarer items are delivered first when the queue is long.
+# Override individual weights with RARITY_WEIGHTS='{"Carrot": 2}'
+RARITY_WEIGHTS = {
+    # SEEDS
+    'Carrot': 1, 'Strawberry': 1, 'Blueberry': 2, 'Orange Tulip': 2, 'Tomato': 3,
+    'Corn': 3, 'Daffodil': 3, 'Watermelon': 5, 'Pumpkin': 5, 'Apple': 5, 'Bamboo': 5,
+    'Coconut': 8, 'Cactus': 8, 'Dragon Fruit': 8, 'Mango': 8, 'Grape': 10, 'Mushroom': 10,
+    'Pepper': 10, 'Cacao': 10,
+    # GEAR
+    'Watering Can': 1, 'Trowel': 2, 'Recall Wrench': 2, 'Basic Sprinkler': 3, 'Advanced Sprinkler': 5,
+    'Godly Sprinkler': 8, 'Lightning Rod': 8, 'Master Sprinkler': 10, 'Favorite Tool': 2,
+    # EGG
+    'Common Egg': 1, 'Uncommon Egg': 2, 'Rare Egg': 3, 'Legendary Egg': 8, 'Bug Egg': 10,
+    # WEATHER
+    'Night': 5, '⚠️ Rain': 3, '⚠️ Thunderstorm': 3, '⚠️ Snow': 3,
+}
+RARITY_WEIGHTS.update(json.loads(os.environ.get('RARITY_WEIGHTS') or '{}'))
+
+WEATHER_EMOJIS = {
+    'Night': '🌙',
+    'Rain': '🌧️',
+    'Thunderstorm': '⛈️',
+    'Snow': '❄️'
+}
@@ -0,0 +1,283 @@
+import asyncio
+import itertools
+import logging
+import os
+import time
+from datetime import timedelta
+
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+from metrics import BOT_API_CALLS, DELIVERY_DURATION, DISPATCHER_QUEUE_DEPTH, NOTIFICATION_DEADLINES
+
+# Telegram allows roughly 30 messages per second overall and about one per second per chat
+GLOBAL_RATE = float(os.environ.get('DISPATCH_RATE', 30))
+PER_CHAT_RATE = 1.0
+PER_CHAT_BURST = 3
+WORKERS = int(os.environ.get('DISPATCH_WORKERS', 16))
+MAX_ATTEMPTS = 4
+BUCKET_PRUNE_INTERVAL = 60
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self):
+        """Seconds until a token is available, without taking it"""
+        self.refill(time.monotonic())
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def reserve(self):
+        """Take one token and return how many seconds the caller has to wait for it."""
+        self.refill(time.monotonic())
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class TickStats:
+    def __init__(self, label):
+        self.label = label
+        self.started = time.monotonic()
+        self.queued = 0
+        self.sent = 0
+        self.failed = 0
+        self.expired = 0
+        self.delays = []
+        self.closed = False
+
+    @property
+    def pending(self):
+        return self.queued - self.sent - self.failed - self.expired
+
+    @property
+    def done(self):
+        return self.closed and self.pending == 0
+
+    def percentile(self, p):
+        if not self.delays:
+            return 0.0
+        ordered = sorted(self.delays)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def summary(self):
+        return {
+            'tick': self.label,
+            'queued': self.queued,
+            'sent': self.sent,
+            'failed': self.failed,
+            'expired': self.expired,
+            'p50_delay': round(self.percentile(50), 3),
+            'p99_delay': round(self.percentile(99), 3),
+        }
+
+
+class Job:
+    __slots__ = ('chat_id', 'action', 'kind', 'tick', 'priority', 'deadline', 'attempts')
+
+    def __init__(self, chat_id, action, kind, tick, priority=0, deadline=None):
+        self.chat_id = chat_id
+        self.action = action
+        self.kind = kind
+        self.tick = tick
+        self.priority = priority
+        self.deadline = deadline  # Unix time after which the job is dropped unsent
+        self.attempts = 0
+
+    @property
+    def expired(self):
+        return self.deadline is not None and time.time() >= self.deadline
+
+
+class NotificationDispatcher:
+    """Delivers queued Bot API calls through a bounded worker pool.
+
+    Every job is an ``async def action(bot)`` callable. Workers respect a global
+    token bucket plus a per-chat one and pause everything on flood-wait errors.
+    Jobs for a chat that is over its limit are put back later instead of
+    holding a worker. Higher-priority jobs run first, and jobs whose deadline
+    has passed are dropped instead of being delivered late.
+    """
+
+    def __init__(self, bot, workers=WORKERS, rate=GLOBAL_RATE):
+        self.bot = bot
+        self.workers = workers
+        self.queue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()  # FIFO order within one priority
+        self.global_bucket = TokenBucket(rate, rate)
+        self.chat_buckets = {}
+        self.paused_until = 0.0
+        self.current_tick = None
+        self.last_tick = None
+        self._tasks = []
+        self._last_prune = time.monotonic()
+        self._pending = 0  # Submitted jobs not finished yet, including deferred ones
+        self._idle = asyncio.Event()
+        self._idle.set()
+        DISPATCHER_QUEUE_DEPTH.set_function(self.queue.qsize)
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def begin_tick(self, label):
+        self.current_tick = TickStats(label)
+        return self.current_tick
+
+    def end_tick(self):
+        tick = self.current_tick
+        self.current_tick = None
+        if tick is not None:
+            tick.closed = True
+            self._maybe_finish(tick)
+
+    def submit(self, chat_id, action, kind='send', priority=0, deadline=None):
+        tick = self.current_tick
+        if tick is not None:
+            tick.queued += 1
+        self._pending += 1
+        self._idle.clear()
+        self._put(Job(chat_id, action, kind, tick, priority, deadline))
+
+    def _put(self, job):
+        self.queue.put_nowait((-job.priority, next(self._sequence), job))
+
+    async def join(self):
+        await self._idle.wait()
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue.qsize(),
+            'current_tick': self.current_tick.summary() if self.current_tick else None,
+            'last_tick': self.last_tick.summary() if self.last_tick else None,
+        }
+
+    async def _worker(self):
+        while True:
+            _, _, job = await self.queue.get()
+            try:
+                wait = 0.0 if job.expired else self._chat_delay(job.chat_id)
+                if wait:
+                    # Still pending: skip the bookkeeping below until the job really runs
+                    asyncio.get_running_loop().call_later(wait, self._put, job)
+                    continue
+                await self._run(job)
+            except Exception as e:
+                logging.error(f"Dispatcher job for {job.chat_id} crashed: {e}")
+            finally:
+                self.queue.task_done()
+            self._pending -= 1
+            if not self._pending:
+                self._idle.set()
+
+    def _chat_delay(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        return bucket.delay() if bucket is not None else 0.0
+
+    async def _run(self, job):
+        while True:
+            if job.expired:
+                self._expire(job)
+                return
+            job.attempts += 1
+            await self._acquire(job.chat_id)
+            try:
+                await job.action(self.bot)
+            except RetryAfter as e:
+                retry_after = e.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+                logging.warning(f"Flood control hit, pausing dispatcher for {retry_after}s")
+                BOT_API_CALLS.labels(job.kind, 'retry_after').inc()
+                if job.attempts < MAX_ATTEMPTS:
+                    continue
+                self._record(job, ok=False, error=e)
+            except BadRequest as e:
+                self._record(job, ok=False, error=e)
+            except NetworkError as e:
+                if job.attempts < MAX_ATTEMPTS:
+                    await asyncio.sleep(2 ** job.attempts)
+                    continue
+                self._record(job, ok=False, error=e)
+            except Exception as e:
+                self._record(job, ok=False, error=e)
+            else:
+                self._record(job, ok=True)
+            return
+
+    async def _acquire(self, chat_id):
+        while True:
+            pause = self.paused_until - time.monotonic()
+            if pause <= 0:
+                break
+            await asyncio.sleep(pause)
+
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(PER_CHAT_RATE, PER_CHAT_BURST)
+        wait = bucket.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+        wait = self.global_bucket.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+        self._prune_chat_buckets()
+
+    def _prune_chat_buckets(self):
+        now = time.monotonic()
+        if now - self._last_prune < BUCKET_PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        for chat_id in list(self.chat_buckets):
+            bucket = self.chat_buckets[chat_id]
+            bucket.refill(now)
+            if bucket.tokens >= bucket.capacity:
+                del self.chat_buckets[chat_id]
+
+    def _expire(self, job):
+        NOTIFICATION_DEADLINES.labels('expired').inc()
+        if job.tick is not None:
+            job.tick.expired += 1
+            self._maybe_finish(job.tick)
+
+    def _record(self, job, ok, error=None):
+        BOT_API_CALLS.labels(job.kind, 'ok' if ok else 'failed').inc()
+        if not ok:
+            logging.debug(f"Failed to deliver notification to {job.chat_id}: {error}")
+        elif job.deadline is not None:
+            NOTIFICATION_DEADLINES.labels('on_time' if time.time() <= job.deadline else 'late').inc()
+        tick = job.tick
+        if tick is None:
+            return
+        if ok:
+            tick.sent += 1
+            tick.delays.append(time.monotonic() - tick.started)
+        else:
+            tick.failed += 1
+        self._maybe_finish(tick)
+
+    def _maybe_finish(self, tick):
+        if not tick.done:
+            return
+        self.last_tick = tick
+        DELIVERY_DURATION.observe(time.monotonic() - tick.started)
+        if tick.failed or tick.expired:
+            logging.warning(f"Tick delivery stats: {tick.summary()}")
+        else:
+            logging.info(f"Tick delivery stats: {tick.summary()}")
@@ -0,0 +1,80 @@
+import logging
+import time
+from datetime import datetime
+
+from constants import RARITY_WEIGHTS
+
+
+class TimedEvent:
+    """A notification that repeats every `interval` seconds at `offset` seconds into the interval"""
+    __slots__ = ('name', 'item', 'interval', 'offset', 'text', 'lifetime')
+
+    def __init__(self, name, item, interval, offset, text, lifetime=300):
+        self.name = name
+        self.item = item  # WEATHER item whose subscribers get the event
+        self.interval = interval
+        self.offset = offset
+        self.text = text
+        self.lifetime = lifetime  # Seconds after the event time the notification is still worth sending
+
+    def next_delay(self, now):
+        return (self.offset - now) % self.interval
+
+
+# Calendar of timed WEATHER events; new events only need an entry here
+EVENT_CALENDAR = [
+    TimedEvent('night_warning', 'Night', interval=3600, offset=55 * 60,
+               text="🌙 <b>Night</b> event starts in 5 minutes!"),
+    TimedEvent('night_start', 'Night', interval=3600, offset=0,
+               text="🌙 Event <b>Night</b> started!"),
+]
+
+
+class EventScheduler:
+    """Fires calendar events on the PTB job queue, independent of stock polling.
+
+    Recipients come from the bot's subscriber index for the event's WEATHER
+    item, and each occurrence is queued as one dispatcher tick.
+    """
+
+    def __init__(self, bot, calendar=EVENT_CALENDAR):
+        self.bot = bot
+        self.calendar = calendar
+
+    def schedule(self, job_queue):
+        now = time.time()
+        for event in self.calendar:
+            job_queue.run_repeating(
+                self.fire,
+                interval=event.interval,
+                first=event.next_delay(now),
+                name=f'event_{event.name}',
+                data=event,
+                job_kwargs={'misfire_grace_time': 60, 'coalesce': True, 'max_instances': 1}
+            )
+
+    async def fire(self, context):
+        event = context.job.data
+        # Round to the scheduled time so a late start still gets the right deadline
+        event_ts = round((time.time() - event.offset) / event.interval) * event.interval + event.offset
+        self.send(event, event_ts)
+
+    def send(self, event, event_ts):
+        bot = self.bot
+        recipients = [
+            user_id for user_id in bot.subscribers.get(('WEATHER', event.item), ())
+            if user_id in bot.users and bot.users[user_id].tracking_enabled
+        ]
+        if not recipients:
+            return 0
+
+        label = f"{event.name} {datetime.fromtimestamp(event_ts).strftime('%H:%M')}"
+        notification = [(event.text, RARITY_WEIGHTS.get(event.item, 0))]
+        bot.dispatcher.begin_tick(label)
+        for user_id in recipients:
+            bot.replace_notifications(
+                user_id, 'weather', notification, deadline=event_ts + event.lifetime, parse_mode='HTML'
+            )
+        bot.dispatcher.end_tick()
+        logging.info(f"Queued {event.name} for {len(recipients)} users")
+        return len(recipients)
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import time
+from array import array
+
+from background import log_errors, single_thread_executor
+
+HISTORY_DIR = os.environ.get('HISTORY_DIR', 'history')
+
+# Fixed-width record: unix time, item id, quantity. A snapshot is written as one
+# SNAPSHOT_MARKER record (quantity = item count) followed by its item records.
+RECORD = struct.Struct('<IHI')
+SNAPSHOT_MARKER = 0xFFFF
+
+
+class ItemHistory:
+    __slots__ = ('times', 'quantities')
+
+    def __init__(self):
+        self.times = array('I')
+        self.quantities = array('I')
+
+
+class StockHistory:
+    """Append-only on-disk stock history with an in-memory per-item index.
+
+    records.bin holds fixed-width records and items.txt maps item ids to
+    "CATEGORY<tab>name" lines. All file access and index reads run on one
+    background thread, so the async query helpers never block the event loop.
+    A read-only history (shard workers) indexes appended snapshots in memory
+    but leaves the files to the single writer process.
+    """
+
+    def __init__(self, path=HISTORY_DIR, writable=True):
+        self.path = path
+        self.writable = writable
+        self.records_path = os.path.join(path, 'records.bin')
+        self.items_path = os.path.join(path, 'items.txt')
+        self.item_ids = {}  # (category, name) -> id
+        self.item_keys = []  # id -> (category, name)
+        self.items = []  # id -> ItemHistory
+        self.snapshot_times = array('I')
+        self._executor = single_thread_executor('stock-history')
+
+    def load(self):
+        self._executor.submit(self._load).result()
+        return self
+
+    def _load(self):
+        os.makedirs(self.path, exist_ok=True)
+        if os.path.exists(self.items_path):
+            with open(self.items_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    category, name = line.rstrip('\n').split('\t', 1)
+                    self._register_item(category, name)
+
+        if not os.path.exists(self.records_path) or not os.path.getsize(self.records_path):
+            return
+        size = os.path.getsize(self.records_path)
+        # Ignore a torn trailing record left by a crash mid-append
+        size -= size % RECORD.size
+        with open(self.records_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for timestamp, item_id, quantity in RECORD.iter_unpack(data[:size]):
+                    self._index(timestamp, item_id, quantity)
+        logging.info(f"Loaded stock history: {len(self.snapshot_times)} snapshots")
+
+    def _register_item(self, category, name):
+        item_id = len(self.item_keys)
+        self.item_ids[(category, name)] = item_id
+        self.item_keys.append((category, name))
+        self.items.append(ItemHistory())
+        return item_id
+
+    def _index(self, timestamp, item_id, quantity):
+        if item_id == SNAPSHOT_MARKER:
+            self.snapshot_times.append(timestamp)
+        elif item_id < len(self.items):
+            history = self.items[item_id]
+            history.times.append(timestamp)
+            history.quantities.append(quantity)
+
+    def append(self, snapshot, timestamp):
+        """Queue one snapshot for writing; snapshots not newer than the last one are skipped"""
+        future = self._executor.submit(self._append, snapshot, int(timestamp))
+        future.add_done_callback(log_errors("append stock history"))
+
+    def _append(self, snapshot, timestamp):
+        if self.snapshot_times and timestamp <= self.snapshot_times[-1]:
+            return
+
+        new_items = []
+        records = [(timestamp, SNAPSHOT_MARKER, sum(len(items) for items in snapshot.items.values()))]
+        for category, items in snapshot.items.items():
+            for name, quantity in items.items():
+                item_id = self.item_ids.get((category, name))
+                if item_id is None:
+                    item_id = self._register_item(category, name)
+                    new_items.append(f"{category}\t{name}\n")
+                records.append((timestamp, item_id, max(0, int(quantity))))
+
+        if self.writable:
+            if new_items:
+                with open(self.items_path, 'a', encoding='utf-8') as f:
+                    f.writelines(new_items)
+            with open(self.records_path, 'ab') as f:
+                f.write(b''.join(RECORD.pack(*record) for record in records))
+        for record in records:
+            self._index(*record)
+
+    def find_item(self, query):
+        query = query.strip().lower()
+        for key in self.item_keys:
+            if key[1].lower() == query:
+                return key
+        for key in self.item_keys:
+            if query in key[1].lower():
+                return key
+        return None
+
+    def _count_since(self, times, since):
+        # times are sorted because records are appended in time order
+        low, high = 0, len(times)
+        while low < high:
+            middle = (low + high) // 2
+            if times[middle] < since:
+                low = middle + 1
+            else:
+                high = middle
+        return len(times) - low
+
+    def _item_stats(self, query, now):
+        key = self.find_item(query)
+        if key is None:
+            return None
+        history = self.items[self.item_ids[key]]
+        stats = {'category': key[0], 'name': key[1], 'appearances': len(history.times), 'windows': {}}
+        if history.times:
+            stats['last_seen'] = history.times[-1]
+            stats['last_quantity'] = history.quantities[-1]
+        for label, seconds in (('24h', 86400), ('7d', 7 * 86400)):
+            since = now - seconds
+            stats['windows'][label] = (
+                self._count_since(history.times, since), self._count_since(self.snapshot_times, since)
+            )
+        stats['first_snapshot'] = self.snapshot_times[0] if self.snapshot_times else None
+        return stats
+
+    def _top_items(self, window, limit):
+        since = time.time() - window
+        snapshots = self._count_since(self.snapshot_times, since)
+        per_category = {}
+        for (category, name), history in zip(self.item_keys, self.items):
+            count = self._count_since(history.times, since)
+            if count:
+                per_category.setdefault(category, []).append((count, name))
+        top = {
+            category: [(name, count) for count, name in sorted(items, reverse=True)[:limit]]
+            for category, items in per_category.items()
+        }
+        return snapshots, top
+
+    async def item_stats(self, query):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._item_stats, query, time.time())
+
+    async def top_items(self, window=86400, limit=5):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._top_items, window, limit)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,173 @@
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    body = ','.join(f'{name}="{str(value)}"' for name, value in pairs)
+    return '{' + body + '}'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self.labels()  # Unlabelled metrics are exported from the start
+        REGISTRY.append(self)
+
+    def labels(self, *values):
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _default(self):
+        return self.labels()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, values))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self.function = None
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        self.function = function
+
+    def render(self, name, labelnames, values):
+        value = self.function() if self.function else self.value
+        return [f"{name}{_format_labels(labelnames, values)} {value}"]
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[index] += 1
+
+    def render(self, name, labelnames, values):
+        lines = []
+        for bound, count in zip(self.buckets, self.counts):
+            lines.append(f"{name}_bucket{_format_labels(labelnames, values, ('le', bound))} {count}")
+        lines.append(f"{name}_bucket{_format_labels(labelnames, values, ('le', '+Inf'))} {self.count}")
+        lines.append(f"{name}_count{_format_labels(labelnames, values)} {self.count}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, values)} {self.sum}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value):
+        self._default().set(value)
+
+    def set_function(self, function):
+        self._default().set_function(function)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+
+REGISTRY = []
+
+
+def render_metrics():
+    """Prometheus text exposition format for every registered metric"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+FETCH_LATENCY = Histogram(
+    'garden_stock_fetch_seconds', 'Stock API request latency', ['status']
+)
+FETCH_BYTES = Counter('garden_stock_fetch_bytes_total', 'Stock API payload bytes received')
+DETECTION_DELAY = Histogram(
+    'garden_stock_detection_delay_seconds', 'Delay between the 5-minute boundary and detecting new stock'
+)
+FANOUT_DURATION = Histogram(
+    'garden_fanout_seconds', 'Time to match users and queue notifications for a tick'
+)
+DELIVERY_DURATION = Histogram(
+    'garden_tick_delivery_seconds', 'Time from tick start until all its notifications were delivered'
+)
+BOT_API_CALLS = Counter(
+    'garden_bot_api_calls_total', 'Notification Bot API calls by kind and outcome', ['kind', 'outcome']
+)
+NOTIFICATION_DEADLINES = Counter(
+    'garden_notification_deadlines_total',
+    'Deadline-bound notifications: delivered on_time, delivered late, or expired and dropped', ['result']
+)
+DISPATCHER_QUEUE_DEPTH = Gauge('garden_dispatcher_queue_depth', 'Jobs waiting in the dispatcher queue')
+STOCK_CACHE_AGE = Gauge('garden_stock_cache_age_seconds', 'Seconds since the stock API last confirmed the cached stock')
+USER_SAVE_LATENCY = Histogram('garden_user_save_seconds', 'Latency of persisting one user record')
+HANDLER_LATENCY = Histogram(
+    'garden_handler_seconds', 'Update handler latency by callback type', ['handler']
+)
+VIEW_CACHE_LOOKUPS = Counter(
+    'garden_view_cache_lookups_total', 'Rendered view cache lookups by cache and result', ['cache', 'result']
+)
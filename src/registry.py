@@ -0,0 +1,128 @@
+import os
+import time
+
+from background import connect_sqlite, log_errors, single_thread_executor
+
+NOTIFICATIONS_DB = os.environ.get('NOTIFICATIONS_DB', 'notifications.db')
+# Telegram only lets bots delete messages younger than 48 hours; keep a safety margin
+DELETE_WINDOW = 47 * 3600
+PRUNE_INTERVAL = 3600
+_log_write_error = log_errors("persist notification registry")
+
+
+class NotificationRegistry:
+    """Message IDs of posted notifications per user and group, persisted in SQLite.
+
+    Entries older than Telegram's delete window are pruned, since those
+    messages can no longer be removed by the bot anyway.
+    """
+
+    def __init__(self, path=NOTIFICATIONS_DB):
+        self.path = path
+        self.entries = {}  # user_id -> {group: [(message_id, sent_at)]}
+        self._executor = single_thread_executor('notification-registry')
+        self._conn = None
+        self._last_prune = time.time()
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = connect_sqlite(
+                self.path,
+                'CREATE TABLE IF NOT EXISTS messages ('
+                'user_id TEXT NOT NULL, grp TEXT NOT NULL, message_id INTEGER NOT NULL, '
+                'sent_at REAL NOT NULL, PRIMARY KEY (user_id, message_id))'
+            )
+        return self._conn
+
+    def load(self):
+        rows = self._executor.submit(self._load, time.time() - DELETE_WINDOW).result()
+        for user_id, group, message_id, sent_at in rows:
+            self.entries.setdefault(user_id, {}).setdefault(group, []).append((message_id, sent_at))
+        return self
+
+    def _load(self, cutoff):
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM messages WHERE sent_at < ?', (cutoff,))
+        return conn.execute(
+            'SELECT user_id, grp, message_id, sent_at FROM messages ORDER BY sent_at'
+        ).fetchall()
+
+    def users_in(self, group):
+        return [user_id for user_id, groups in self.entries.items() if groups.get(group)]
+
+    def messages(self, user_id, group):
+        return [message_id for message_id, _ in self.entries.get(str(user_id), {}).get(group, [])]
+
+    def add(self, user_id, group, message_id, sent_at=None):
+        user_id = str(user_id)
+        sent_at = sent_at or time.time()
+        self.entries.setdefault(user_id, {}).setdefault(group, []).append((message_id, sent_at))
+        self._submit(self._insert, user_id, group, message_id, sent_at)
+
+    def take(self, user_id, group, keep_last=False):
+        """Forget the group's messages (all but the newest with keep_last) and return their IDs"""
+        user_id = str(user_id)
+        groups = self.entries.get(user_id)
+        if not groups or not groups.get(group):
+            return []
+        entries = groups[group]
+        taken, kept = (entries[:-1], entries[-1:]) if keep_last else (entries, [])
+        if kept:
+            groups[group] = kept
+        else:
+            del groups[group]
+            if not groups:
+                del self.entries[user_id]
+
+        cutoff = time.time() - DELETE_WINDOW
+        message_ids = [message_id for message_id, sent_at in taken]
+        if message_ids:
+            self._submit(self._delete, user_id, message_ids)
+        return [message_id for message_id, sent_at in taken if sent_at >= cutoff]
+
+    def maybe_prune(self):
+        now = time.time()
+        if now - self._last_prune < PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        cutoff = now - DELETE_WINDOW
+        for user_id in list(self.entries):
+            groups = self.entries[user_id]
+            for group in list(groups):
+                groups[group] = [entry for entry in groups[group] if entry[1] >= cutoff]
+                if not groups[group]:
+                    del groups[group]
+            if not groups:
+                del self.entries[user_id]
+        self._submit(self._prune, cutoff)
+
+    def _submit(self, function, *args):
+        self._executor.submit(function, *args).add_done_callback(_log_write_error)
+
+    def _insert(self, user_id, group, message_id, sent_at):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO messages (user_id, grp, message_id, sent_at) VALUES (?, ?, ?, ?)',
+                (user_id, group, message_id, sent_at)
+            )
+
+    def _delete(self, user_id, message_ids):
+        with self._connect() as conn:
+            conn.executemany(
+                'DELETE FROM messages WHERE user_id = ? AND message_id = ?',
+                [(user_id, message_id) for message_id in message_ids]
+            )
+
+    def _prune(self, cutoff):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM messages WHERE sent_at < ?', (cutoff,))
+
+    def close(self):
+        self._executor.submit(self._close).result()
+        self._executor.shutdown(wait=True)
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,82 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+
+SHARDS = int(os.environ.get('SHARDS', 0))
+# Shard i serves its own /healthz and /metrics on SHARD_PORT_BASE + i (0 picks free ports)
+SHARD_PORT_BASE = int(os.environ.get('SHARD_PORT_BASE', 9100))
+STOP_TIMEOUT = 30
+
+
+def user_key(user_id):
+    """Stable 64-bit key of a user ID (unlike hash(), identical in every process)"""
+    digest = hashlib.blake2b(str(user_id).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def jump_hash(key, buckets):
+    """Jump consistent hash: growing from N to N+1 buckets moves only 1/(N+1) of the keys"""
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_for(user_id, shards):
+    return jump_hash(user_key(user_id), shards)
+
+
+def shard_port(index):
+    return SHARD_PORT_BASE + index if SHARD_PORT_BASE else 0
+
+
+class ShardRouter:
+    """Runs the shard worker processes and feeds each one through its own queue.
+
+    Messages are tuples: ('update', update_dict) goes to the shard owning the
+    user, while ('stock', payload, fetched_at), ('tick', payload, boundary_ts)
+    and ('saved', payload) from /save_stock are broadcast to every shard.
+    None tells a worker to shut down.
+    """
+
+    def __init__(self, shards=SHARDS):
+        self.shards = shards
+        self.context = multiprocessing.get_context('spawn')
+        self.queues = [self.context.Queue() for _ in range(shards)]
+        self.processes = []
+
+    def start(self, target):
+        for index, queue in enumerate(self.queues):
+            process = self.context.Process(
+                target=target, args=(index, self.shards, queue), name=f'garden-shard-{index}', daemon=True
+            )
+            process.start()
+            self.processes.append(process)
+        logging.info(f"Started {self.shards} shard workers")
+
+    def forward(self, user_id, update_data):
+        shard = shard_for(user_id, self.shards) if user_id is not None else 0
+        self.queues[shard].put(('update', update_data))
+
+    def broadcast(self, message):
+        for queue in self.queues:
+            queue.put(message)
+
+    def stats(self):
+        return {
+            'shards': self.shards,
+            'alive': sum(process.is_alive() for process in self.processes),
+            'metrics_ports': [shard_port(index) for index in range(self.shards)],
+        }
+
+    def stop(self):
+        self.broadcast(None)
+        for process in self.processes:
+            process.join(STOP_TIMEOUT)
+            if process.is_alive():
+                logging.warning(f"{process.name} did not stop in time, terminating")
+                process.terminate()
+        self.processes = []
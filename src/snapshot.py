@@ -0,0 +1,79 @@
+import sys
+
+from tracking import ITEM_BITS, items_to_mask
+
+
+class StockSnapshot:
+    """Parsed stock payload: items keyed by category and item name"""
+
+    __slots__ = ('timestamp', 'items', 'masks', 'payload', '_matches')
+
+    def __init__(self, timestamp, items, payload=None):
+        self.timestamp = timestamp
+        self.items = items  # {category: {name: quantity}}
+        self.masks = {category: items_to_mask(category, names) for category, names in items.items()}
+        self.payload = payload
+        # (category, tracked bits in stock) -> matches; every user is matched against one snapshot
+        self._matches = {}
+
+    @classmethod
+    def from_payload(cls, payload):
+        items = {}
+        for section in payload.get('data', []):
+            category = sys.intern(section['section'].split()[0])
+            items[category] = {
+                sys.intern(item['name']): item['quantity'] for item in section['items']
+            }
+        return cls(payload.get('timestamp'), items, payload)
+
+    def matches(self, category, mask):
+        """Items of the category whose bits are set in a user's tracking mask (shared, don't modify)"""
+        hit = self.masks.get(category, 0) & mask
+        if not hit:
+            return ()
+        key = (category, hit)
+        matches = self._matches.get(key)
+        if matches is None:
+            bits = ITEM_BITS[category]
+            matches = self._matches[key] = tuple(
+                (name, quantity) for name, quantity in self.items[category].items()
+                if bits.get(name, 0) & hit
+            )
+        return matches
+
+
+class CategoryDiff:
+    __slots__ = ('added', 'removed', 'changed')
+
+    def __init__(self):
+        self.added = {}  # name -> quantity
+        self.removed = {}  # name -> previous quantity
+        self.changed = {}  # name -> (previous quantity, quantity)
+
+    def names(self):
+        yield from self.added
+        yield from self.removed
+        yield from self.changed
+
+
+def diff_snapshots(old, new):
+    """Return {category: CategoryDiff} for every category whose items differ"""
+    old_items = old.items if old is not None else {}
+    diff = {}
+    for category in new.items.keys() | old_items.keys():
+        before = old_items.get(category, {})
+        after = new.items.get(category, {})
+        if before == after:
+            continue
+
+        changes = CategoryDiff()
+        for name, quantity in after.items():
+            if name not in before:
+                changes.added[name] = quantity
+            elif before[name] != quantity:
+                changes.changed[name] = (before[name], quantity)
+        for name, quantity in before.items():
+            if name not in after:
+                changes.removed[name] = quantity
+        diff[category] = changes
+    return diff
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+
+from background import log_errors, single_thread_executor
+from metrics import STOCK_CACHE_AGE
+from snapshot import StockSnapshot
+
+STOCK_CACHE_FILE = os.environ.get('STOCK_CACHE_FILE', 'last_stock.json')
+# Open the circuit after this many consecutive failures and keep it open for the cooldown
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 60
+REVALIDATE_ATTEMPTS = 5
+REVALIDATE_BASE_DELAY = 2
+REVALIDATE_MAX_DELAY = 30
+STOCK_INTERVAL = 300
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+def backoff_delay(attempt, base=REVALIDATE_BASE_DELAY, cap=REVALIDATE_MAX_DELAY):
+    """Exponential backoff with jitter, so retries of several callers don't line up"""
+    delay = min(cap, base * 2 ** attempt)
+    return random.uniform(delay / 2, delay)
+
+
+class StockCache:
+    """Last known stock, served stale while it is revalidated in the background.
+
+    The cache is warmed from STOCK_CACHE_FILE at startup and rewritten on every
+    new snapshot. All fetches go through a circuit breaker, so an unreachable
+    stock API is not hammered by pollers, handlers and revalidation at once.
+    Without a client (shard workers) the cache is only fed through update().
+    """
+
+    def __init__(self, client, path=STOCK_CACHE_FILE):
+        self.client = client
+        self.on_fetch = None  # Called with (payload, fetched_at) after every successful fetch
+        self.path = path
+        self.snapshot = None
+        self.fetched_at = None  # Unix time the API last confirmed the snapshot
+        self.failures = 0
+        self.open_until = 0.0
+        self._revalidation = None
+        self._executor = single_thread_executor('stock-cache')
+        STOCK_CACHE_AGE.set_function(lambda: self.age() or 0)
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return self
+        except (OSError, ValueError) as e:
+            logging.error(f"Failed to load cached stock: {e}")
+            return self
+        self.snapshot = StockSnapshot.from_payload(data['payload'])
+        self.fetched_at = data.get('fetched_at')
+        logging.info(f"Warmed stock cache from {self.path} (timestamp {self.snapshot.timestamp})")
+        return self
+
+    @property
+    def payload(self):
+        return self.snapshot.payload if self.snapshot else None
+
+    def age(self):
+        return time.time() - self.fetched_at if self.fetched_at else None
+
+    def is_stale(self):
+        """True when a stock rotation happened since the API last confirmed the snapshot"""
+        if self.fetched_at is None:
+            return True
+        return self.fetched_at < time.time() // STOCK_INTERVAL * STOCK_INTERVAL
+
+    def circuit_open(self):
+        return self.failures >= BREAKER_THRESHOLD and time.time() < self.open_until
+
+    async def fetch(self, conditional=True):
+        """Fetch through the circuit breaker; returns None when the stock is not modified"""
+        if self.circuit_open():
+            raise CircuitOpenError(f"stock API circuit open for {self.open_until - time.time():.0f}s")
+        try:
+            payload = await self.client.fetch(conditional=conditional)
+        except Exception:
+            self.failures += 1
+            if self.failures >= BREAKER_THRESHOLD:
+                self.open_until = time.time() + BREAKER_COOLDOWN
+                logging.warning(f"Stock API failed {self.failures} times in a row, opening circuit")
+            raise
+
+        self.failures = 0
+        self.update(payload, time.time())
+        if self.on_fetch is not None:
+            self.on_fetch(self.payload, self.fetched_at)
+        return payload
+
+    def update(self, payload, fetched_at):
+        """Record a confirmed stock; payload is None when only the age is refreshed"""
+        self.fetched_at = fetched_at
+        if payload is not None:
+            if not self.snapshot or payload.get('timestamp') != self.snapshot.timestamp:
+                self.snapshot = StockSnapshot.from_payload(payload)
+                if self.client is not None:
+                    self.save()
+
+    def revalidate(self):
+        """Refresh in the background unless a refresh is already running"""
+        if self.client is None:
+            return None
+        if self._revalidation is None or self._revalidation.done():
+            self._revalidation = asyncio.create_task(self._revalidate())
+        return self._revalidation
+
+    async def _revalidate(self):
+        for attempt in range(REVALIDATE_ATTEMPTS):
+            try:
+                await self.fetch()
+                return
+            except CircuitOpenError:
+                return
+            except Exception as e:
+                logging.warning(f"Stock revalidation failed (attempt {attempt + 1}): {e}")
+            await asyncio.sleep(backoff_delay(attempt))
+
+    def save(self):
+        data = json.dumps({'fetched_at': self.fetched_at, 'payload': self.snapshot.payload})
+        self._executor.submit(self._write, data).add_done_callback(log_errors("persist cached stock"))
+
+    def _write(self, data):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def stats(self):
+        return {
+            'timestamp': self.snapshot.timestamp if self.snapshot else None,
+            'age': round(self.age(), 1) if self.fetched_at else None,
+            'failures': self.failures,
+            'circuit_open': self.circuit_open(),
+        }
+
+    async def close(self):
+        if self._revalidation is not None:
+            self._revalidation.cancel()
+            await asyncio.gather(self._revalidation, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+        if self.client is not None:
+            await self.client.close()
@@ -0,0 +1,75 @@
+import logging
+import time
+
+import aiohttp
+
+from metrics import FETCH_BYTES, FETCH_LATENCY
+
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 10
+TOTAL_TIMEOUT = 20
+
+
+class StockClient:
+    """Long-lived HTTP client for the garden stock API.
+
+    Uses conditional requests, so fetch() returns None when the server
+    answers 304 Not Modified and the previous payload is still current.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.session = None
+        self.etag = None
+        self.last_modified = None
+        self.last_latency = None
+        self.last_size = None
+
+    def _get_session(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(
+                    total=TOTAL_TIMEOUT, sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT
+                ),
+                connector=aiohttp.TCPConnector(limit=4, ttl_dns_cache=300, keepalive_timeout=60),
+            )
+        return self.session
+
+    async def fetch(self, conditional=True):
+        headers = {}
+        if conditional:
+            if self.etag:
+                headers['If-None-Match'] = self.etag
+            if self.last_modified:
+                headers['If-Modified-Since'] = self.last_modified
+
+        started = time.monotonic()
+        try:
+            async with self._get_session().get(self.url, headers=headers) as response:
+                if response.status == 304:
+                    self.last_latency = time.monotonic() - started
+                    self.last_size = 0
+                    FETCH_LATENCY.labels('304').observe(self.last_latency)
+                    return None
+                response.raise_for_status()
+                body = await response.read()
+                self.last_latency = time.monotonic() - started
+                self.last_size = len(body)
+                stock = await response.json(content_type=None)
+                # Only a parsed body may answer later conditional requests
+                self.etag = response.headers.get('ETag')
+                self.last_modified = response.headers.get('Last-Modified')
+        except Exception:
+            FETCH_LATENCY.labels('error').observe(time.monotonic() - started)
+            raise
+
+        FETCH_LATENCY.labels(str(response.status)).observe(self.last_latency)
+        FETCH_BYTES.inc(self.last_size)
+
+        logging.debug(f"Fetched stock: {self.last_size} bytes in {self.last_latency:.3f}s")
+        return stock
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
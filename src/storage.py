@@ -0,0 +1,136 @@
+import asyncio
+import json
+import logging
+import os
+import time
+
+from background import connect_sqlite, log_errors, single_thread_executor
+from metrics import USER_SAVE_LATENCY
+
+LEGACY_USERS_FILE = 'users.json'
+USER_STORE = os.environ.get('USER_STORE', 'sqlite')
+USER_DB = os.environ.get('USER_DB', 'users.db')
+JSON_FLUSH_DELAY = 1.0
+_log_write_error = log_errors("persist user data")
+
+
+class JsonUserStore:
+    """Whole-file users.json store, flushed atomically and off the event loop.
+
+    Saves are coalesced: every save_user marks the store dirty and a single
+    rewrite happens at most once per JSON_FLUSH_DELAY seconds.
+    """
+
+    def __init__(self, path=LEGACY_USERS_FILE):
+        self.path = path
+        self.users = {}
+        self._executor = single_thread_executor('user-store')
+        self._flush_handle = None
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                self.users = json.load(f)
+        except FileNotFoundError:
+            self.users = {}
+        return self.users
+
+    def save_user(self, user_id, user_data):
+        self.users[user_id] = user_data
+        if self._flush_handle is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self._write(json.dumps(self.users))
+                return
+            self._flush_handle = loop.call_later(JSON_FLUSH_DELAY, self.flush)
+
+    def flush(self):
+        self._flush_handle = None
+        future = self._executor.submit(self._write, json.dumps(self.users))
+        future.add_done_callback(_log_write_error)
+
+    def _write(self, payload):
+        started = time.monotonic()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        USER_SAVE_LATENCY.observe(time.monotonic() - started)
+
+    def close(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self.flush()
+        self._executor.shutdown(wait=True)
+
+
+class SQLiteUserStore:
+    """One row per user in a WAL-mode SQLite database, written from a single background thread"""
+
+    def __init__(self, path=USER_DB, legacy_path=LEGACY_USERS_FILE):
+        self.path = path
+        self.legacy_path = legacy_path
+        self._executor = single_thread_executor('user-store')
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = connect_sqlite(
+                self.path, 'CREATE TABLE IF NOT EXISTS users (user_id TEXT PRIMARY KEY, data TEXT NOT NULL)'
+            )
+        return self._conn
+
+    def load(self):
+        return self._executor.submit(self._load).result()
+
+    def _load(self):
+        conn = self._connect()
+        rows = conn.execute('SELECT user_id, data FROM users').fetchall()
+        if not rows and os.path.exists(self.legacy_path):
+            return self._migrate()
+        return {user_id: json.loads(data) for user_id, data in rows}
+
+    def _migrate(self):
+        with open(self.legacy_path, 'r') as f:
+            users = json.load(f)
+        with self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO users (user_id, data) VALUES (?, ?)',
+                [(user_id, json.dumps(data)) for user_id, data in users.items()]
+            )
+        os.replace(self.legacy_path, f"{self.legacy_path}.migrated")
+        logging.info(f"Migrated {len(users)} users from {self.legacy_path} to {self.path}")
+        return users
+
+    def save_user(self, user_id, user_data):
+        # Serialize on the caller's thread so later in-memory edits can't race the write
+        future = self._executor.submit(self._write, user_id, json.dumps(user_data))
+        future.add_done_callback(_log_write_error)
+        return future
+
+    def _write(self, user_id, payload):
+        started = time.monotonic()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO users (user_id, data) VALUES (?, ?)',
+                (user_id, payload)
+            )
+        USER_SAVE_LATENCY.observe(time.monotonic() - started)
+
+    def close(self):
+        self._executor.submit(self._close).result()
+        self._executor.shutdown(wait=True)
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def create_user_store():
+    if USER_STORE == 'json':
+        return JsonUserStore()
+    return SQLiteUserStore()
@@ -0,0 +1,58 @@
+from constants import TRACKABLE_ITEMS
+
+CATEGORIES = tuple(TRACKABLE_ITEMS)
+CATEGORY_INDEX = {category: index for index, category in enumerate(CATEGORIES)}
+
+# Stable per-category item IDs: an item's bit is its position in TRACKABLE_ITEMS
+ITEM_BITS = {
+    category: {name: 1 << position for position, name in enumerate(items)}
+    for category, items in TRACKABLE_ITEMS.items()
+}
+
+
+def items_to_mask(category, names):
+    bits = ITEM_BITS.get(category, {})
+    mask = 0
+    for name in names:
+        mask |= bits.get(name, 0)
+    return mask
+
+
+def mask_to_items(category, mask):
+    return [name for name, bit in ITEM_BITS.get(category, {}).items() if mask & bit]
+
+
+class UserState:
+    """Per-user tracking settings with selections held as one bitmask per category"""
+
+    __slots__ = ('tracking_enabled', 'masks')
+
+    def __init__(self, tracking_enabled=True, masks=None):
+        self.tracking_enabled = tracking_enabled
+        self.masks = masks if masks is not None else [0] * len(CATEGORIES)
+
+    @classmethod
+    def from_dict(cls, data):
+        # Stored data keeps item names, so older users.json records load unchanged
+        tracked_items = data.get('tracked_items', {})
+        masks = [items_to_mask(category, tracked_items.get(category, ())) for category in CATEGORIES]
+        return cls(data.get('tracking_enabled', True), masks)
+
+    def to_dict(self):
+        return {
+            'tracking_enabled': self.tracking_enabled,
+            'tracked_items': {category: self.tracked(category) for category in CATEGORIES},
+        }
+
+    def mask(self, category):
+        index = CATEGORY_INDEX.get(category)
+        return self.masks[index] if index is not None else 0
+
+    def toggle(self, category, name):
+        """Flip an item's tracking and return whether it is tracked now"""
+        bit = ITEM_BITS[category][name]
+        self.masks[CATEGORY_INDEX[category]] ^= bit
+        return bool(self.masks[CATEGORY_INDEX[category]] & bit)
+
+    def tracked(self, category):
+        return mask_to_items(category, self.mask(category))
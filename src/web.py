@@ -0,0 +1,67 @@
+import logging
+import os
+import secrets
+
+from aiohttp import web
+from telegram import Update
+
+from metrics import render_metrics
+
+WEB_HOST = '0.0.0.0'
+WEB_PORT = int(os.environ.get('PORT', 8080))
+WEBHOOK_PATH = '/webhook'
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class WebServer:
+    """HTTP server on the Fly.io service port: health check, metrics and optional Telegram webhook"""
+
+    def __init__(self, application, bot, webhook_secret=None, port=WEB_PORT):
+        self.application = application
+        self.port = port
+        self.bot = bot
+        self.webhook_secret = webhook_secret
+        self.app = web.Application()
+        self.app.router.add_get('/healthz', self.health)
+        self.app.router.add_get('/metrics', self.metrics)
+        if webhook_secret:
+            self.app.router.add_post(WEBHOOK_PATH, self.webhook)
+        self.runner = None
+
+    async def start(self):
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, WEB_HOST, self.port).start()
+        logging.info(f"HTTP server listening on {WEB_HOST}:{self.port}")
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def health(self, request):
+        snapshot = self.bot.last_snapshot
+        return web.json_response({
+            'status': 'ok',
+            'stock_timestamp': snapshot.timestamp if snapshot else None,
+            'stock_cache': self.bot.stock_cache.stats(),
+            'users': len(self.bot.users),
+            'shards': self.bot.router.stats() if self.bot.router else None,
+            'dispatcher': self.bot.dispatcher.stats() if self.bot.dispatcher else None,
+        })
+
+    async def metrics(self, request):
+        return web.Response(text=render_metrics(), content_type='text/plain', charset='utf-8')
+
+    async def webhook(self, request):
+        token = request.headers.get(SECRET_HEADER, '')
+        if not secrets.compare_digest(token, self.webhook_secret):
+            return web.Response(status=403)
+        try:
+            data = await request.json()
+            update = Update.de_json(data, self.application.bot)
+        except (ValueError, TypeError, AttributeError, KeyError):
+            # Not JSON, or JSON that is not an Update
+            return web.Response(status=400)
+        await self.application.update_queue.put(update)
+        return web.Response()
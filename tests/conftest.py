@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'bench'))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+# Read by the bot modules at import time: bind the HTTP servers to free ports
+os.environ['PORT'] = '0'
+os.environ['SHARD_PORT_BASE'] = '0'
+os.environ.setdefault('DISPATCH_RATE', '1000')
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in an empty directory, so users.db, history and other state files start fresh"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,72 @@
+"""Shared test helpers; conftest.py puts src/ and bench/ on sys.path"""
+import contextlib
+import time
+from datetime import datetime
+
+from fake_bot_api import FakeBotAPI
+from fake_stock_api import FakeStockAPI
+
+
+class Context:
+    def __init__(self, bot):
+        self.bot = bot
+
+
+def stock_payload(timestamp, items):
+    """Stock API payload from {category: {name: quantity}}"""
+    return {
+        'timestamp': timestamp,
+        'data': [
+            {'section': f"{category} STOCK", 'items': [{'name': name, 'quantity': qty} for name, qty in names.items()]}
+            for category, names in items.items()
+        ],
+    }
+
+
+def tap_update(update_id, user_id, data):
+    """Update dict of a button tap by `user_id` on their menu message"""
+    return {
+        'update_id': update_id,
+        'callback_query': {
+            'id': str(update_id),
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'u'},
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {'message_id': 1, 'date': 0, 'text': 'menu', 'chat': {'id': user_id, 'type': 'private'}},
+        },
+    }
+
+
+def current_boundary():
+    return datetime.fromtimestamp(time.time() // 300 * 300)
+
+
+@contextlib.asynccontextmanager
+async def running_bot(stock_api=None, **fake_api_options):
+    """GardenBot wired to a FakeBotAPI and a FakeStockAPI, with its dispatcher running.
+
+    Without `stock_api` a one-step fake stock API is started, so no test reaches the real one.
+    """
+    import bot as bot_module
+    from telegram import Bot
+
+    own_stock_api = stock_api is None
+    if own_stock_api:
+        stock_api = FakeStockAPI([stock_payload('t0', {'SEEDS': {'Carrot': 1}})])
+        await stock_api.start()
+    bot_api = FakeBotAPI(**fake_api_options)
+    await bot_api.start()
+    telegram_bot = Bot('1:fake', base_url=f"{bot_api.url}/bot")
+    await telegram_bot.initialize()
+    garden = bot_module.GardenBot()
+    garden.stock_client.url = stock_api.url
+    context = Context(telegram_bot)
+    await garden.post_init(context)
+    try:
+        yield garden, bot_api, context
+    finally:
+        await garden.post_shutdown(context)
+        await telegram_bot.shutdown()
+        await bot_api.stop()
+        if own_stock_api:
+            await stock_api.stop()
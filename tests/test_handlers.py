@@ -0,0 +1,58 @@
+import asyncio
+from itertools import zip_longest
+
+from telegram import Update
+
+from helpers import running_bot, tap_update
+
+
+def checked_items(markup):
+    return [
+        button['text'][2:] for row in markup['inline_keyboard'] for button in row if button['text'].startswith('✅')
+    ]
+
+
+def test_interleaved_taps_of_two_users_do_not_leak(workdir, monkeypatch):
+    import bot as bot_module
+    monkeypatch.setattr(bot_module, 'TRACKING_FLUSH_DELAY', 0.05)
+    taps = {
+        1: ['config_tracking', 'track_SEEDS_Carrot', 'track_SEEDS_Strawberry'],
+        2: ['config_tracking', 'category_GEAR', 'track_GEAR_Trowel', 'toggle_tracking'],
+    }
+
+    async def scenario():
+        async with running_bot() as (garden, bot_api, context):
+            index = 0
+            for round_taps in zip_longest(taps[1], taps[2]):
+                updates = []
+                for user_id, data in zip(taps, round_taps):
+                    if data is not None:
+                        index += 1
+                        updates.append(Update.de_json(tap_update(index, user_id, data), context.bot))
+                await asyncio.gather(*(garden.button_handler(update, context) for update in updates))
+            await asyncio.sleep(0.3)
+            await garden.dispatcher.join()
+
+            edits = {1: [], 2: []}
+            for method, params in bot_api.requests:
+                if method == 'editMessageText':
+                    edits[int(params['chat_id'])].append(params)
+
+            # User 1 only ever saw the SEEDS tracking menu, ending with their own two items
+            assert all('TRAKING SETTINGS' in edit['text'] for edit in edits[1])
+            assert checked_items(edits[1][-1]['reply_markup']) == ['Carrot', 'Strawberry']
+            # User 2 ended on the main menu with their tracking switched off
+            assert 'MENU' in edits[2][-1]['text']
+            assert edits[2][-1]['reply_markup']['inline_keyboard'][2][0]['text'] == "🔴 Tracking OFF"
+
+            first, second = garden.users['1'], garden.users['2']
+            assert first.tracking_enabled
+            assert first.tracked('SEEDS') == ['Carrot', 'Strawberry'] and first.tracked('GEAR') == []
+            assert not second.tracking_enabled
+            assert second.tracked('GEAR') == ['Trowel'] and second.tracked('SEEDS') == []
+            assert {key: users for key, users in garden.subscribers.items() if users} == {
+                ('SEEDS', 'Carrot'): {'1'},
+                ('SEEDS', 'Strawberry'): {'1'},
+            }
+
+    asyncio.run(scenario())
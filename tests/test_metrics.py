@@ -0,0 +1,65 @@
+import asyncio
+
+from telegram import Update
+
+from helpers import running_bot, tap_update
+from metrics import BOT_API_CALLS, HANDLER_LATENCY
+
+
+def calls(kind, outcome):
+    return BOT_API_CALLS.labels(kind, outcome).value
+
+
+def test_failed_delete_is_counted_as_failed(workdir):
+    async def scenario():
+        async with running_bot(failure_rate=1.0) as (garden, bot_api, context):
+            failed, ok = calls('delete', 'failed'), calls('delete', 'ok')
+            garden.queue_delete(1, [5, 6])
+            await garden.dispatcher.join()
+            assert calls('delete', 'failed') == failed + 1
+            assert calls('delete', 'ok') == ok
+
+    asyncio.run(scenario())
+
+
+def test_digest_fallback_send_has_its_own_kind(workdir, monkeypatch):
+    import bot as bot_module
+    monkeypatch.setattr(bot_module, 'NOTIFICATION_MODE', 'digest')
+
+    async def scenario():
+        async with running_bot(failure_rate=1.0) as (garden, bot_api, context):
+            garden.notification_messages.add(1, 'seeds_gear', 7)
+            edit_failed, send_failed = calls('edit', 'failed'), calls('send', 'failed')
+            garden.replace_notifications(1, 'seeds_gear', [("✅ Carrot in SEEDS - 3", 1)])
+            await garden.dispatcher.join()
+            assert bot_api.calls['editMessageText'] == 1
+            assert bot_api.calls['sendMessage'] == 1
+            assert calls('edit', 'failed') == edit_failed + 1
+            assert calls('send', 'failed') == send_failed + 1
+
+    asyncio.run(scenario())
+
+
+def test_unknown_callback_data_shares_one_handler_label(workdir):
+    async def scenario():
+        async with running_bot() as (garden, bot_api, context):
+            for index, data in enumerate(['bogus-1', 'bogus-2', 'view_stock']):
+                update = Update.de_json(tap_update(index, 1, data), context.bot)
+                await garden.button_handler(update, context)
+
+    asyncio.run(scenario())
+    labels = {values[0] for values in HANDLER_LATENCY._children}
+    assert 'other' in labels and 'view_stock' in labels
+    assert not any(label.startswith('bogus') for label in labels)
+
+
+def test_view_cache_lookups_are_exported():
+    from cache import LRUCache
+    from metrics import VIEW_CACHE_LOOKUPS, render_metrics
+
+    cache = LRUCache('test_view')
+    cache.get_or_create('key', lambda: 'view')
+    cache.get_or_create('key', lambda: 'other')
+    assert VIEW_CACHE_LOOKUPS.labels('test_view', 'miss').value == 1
+    assert VIEW_CACHE_LOOKUPS.labels('test_view', 'hit').value == 1
+    assert 'garden_view_cache_lookups_total{cache="test_view",result="hit"} 1' in render_metrics()
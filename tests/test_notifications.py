@@ -0,0 +1,30 @@
+import asyncio
+
+from helpers import current_boundary, running_bot, stock_payload
+
+
+def test_alert_for_untracked_item_is_deleted_when_item_leaves_stock(workdir):
+    async def scenario():
+        async with running_bot() as (garden, bot_api, context):
+            garden.last_stock = stock_payload('t0', {'SEEDS': {'Tomato': 1}})
+            user = garden.get_user_data(1)
+            user.toggle('SEEDS', 'Carrot')
+            garden.index_user('1', user)
+
+            new_stock = stock_payload('t1', {'SEEDS': {'Carrot': 3, 'Tomato': 1}})
+            await garden.process_stock_update(new_stock, context, current_boundary())
+            garden.last_stock = new_stock
+            await garden.dispatcher.join()
+            assert len(garden.notification_messages.messages(1, 'seeds_gear')) == 1
+
+            user.toggle('SEEDS', 'Carrot')
+            garden.unsubscribe(1, 'SEEDS', 'Carrot')
+            new_stock = stock_payload('t2', {'SEEDS': {'Tomato': 1}})
+            await garden.process_stock_update(new_stock, context, current_boundary())
+            await garden.dispatcher.join()
+
+            assert garden.notification_messages.messages(1, 'seeds_gear') == []
+            assert bot_api.calls['deleteMessages'] == 1
+            assert bot_api.calls['sendMessage'] == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import socket
+import time
+from collections import Counter
+
+import aiohttp
+
+from fake_bot_api import FakeBotAPI
+from fake_stock_api import FakeStockAPI
+from helpers import stock_payload, tap_update
+
+SHARDS = 3
+SUBSCRIBED = 30
+UNSUBSCRIBED = 10
+TIMEOUT = 60
+
+
+def port_free(port):
+    with socket.socket() as sock:
+        try:
+            sock.bind(('127.0.0.1', port))
+        except OSError:
+            return False
+    return True
+
+
+def free_port_range(count):
+    """First of `count` consecutive free ports"""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        base = probe.getsockname()[1]
+    for start in range(base, base + 1000):
+        if all(port_free(port) for port in range(start, start + count)):
+            return start
+    raise RuntimeError("no free port range")
+
+
+async def wait_for(condition, timeout=TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.05)
+
+
+async def shard_get(session, port, path):
+    async with session.get(f"http://127.0.0.1:{port}{path}") as response:
+        return await (response.json() if path == '/healthz' else response.text())
+
+
+def handler_count(metrics_text, handler):
+    prefix = f'garden_handler_seconds_count{{handler="{handler}"}} '
+    for line in metrics_text.splitlines():
+        if line.startswith(prefix):
+            return int(float(line[len(prefix):]))
+    return 0
+
+
+def test_sharded_delivery_and_routing(workdir, monkeypatch):
+    user_ids = [100000 + index for index in range(SUBSCRIBED + UNSUBSCRIBED)]
+    subscribed = user_ids[:SUBSCRIBED]
+    users = {
+        str(user_id): {
+            'tracking_enabled': True,
+            'tracked_items': {'SEEDS': ['Strawberry' if user_id in subscribed else 'Blueberry']},
+        }
+        for user_id in user_ids
+    }
+    with open('users.json', 'w') as f:
+        json.dump(users, f)
+
+    async def scenario():
+        import bot as bot_module
+        from sharding import ShardRouter, shard_for
+
+        bot_api = FakeBotAPI()
+        await bot_api.start()
+        stock_api = FakeStockAPI([
+            stock_payload('t0', {'SEEDS': {'Carrot': 5}}),
+            stock_payload('t1', {'SEEDS': {'Carrot': 5, 'Strawberry': 2}}),
+        ])
+        await stock_api.start()
+        port_base = free_port_range(SHARDS)
+        # Spawned workers read their configuration from the environment
+        monkeypatch.setenv('TELEGRAM_BOT_TOKEN', '1:fake')
+        monkeypatch.setenv('BOT_API_URL', f"{bot_api.url}/bot")
+        monkeypatch.setenv('SHARD_PORT_BASE', str(port_base))
+        ports = [port_base + index for index in range(SHARDS)]
+
+        router = ShardRouter(SHARDS)
+        fetcher = bot_module.GardenBot(router=router)
+        fetcher.stock_client.url = stock_api.url
+        router.start(bot_module.run_worker)
+        try:
+            async with aiohttp.ClientSession() as session:
+                async def shards_up():
+                    try:
+                        return [await shard_get(session, port, '/healthz') for port in ports]
+                    except aiohttp.ClientError:
+                        return None
+
+                deadline = time.monotonic() + TIMEOUT
+                while (health := await shards_up()) is None:
+                    assert time.monotonic() < deadline, "shards did not start"
+                    await asyncio.sleep(0.1)
+
+                # Every user is owned by exactly one shard
+                spread = Counter(shard_for(user_id, SHARDS) for user_id in user_ids)
+                assert [shard['users'] for shard in health] == [spread[index] for index in range(SHARDS)]
+
+                # A tick reaches every subscribed user exactly once and nobody else
+                fetcher.last_stock = await fetcher.fetch_stock()
+                stock_api.advance()
+                bot_api.reset()
+                await fetcher.fetch_stock()
+                router.broadcast(('tick', fetcher.stock_cache.payload, time.time() // 300 * 300))
+                await wait_for(lambda: bot_api.calls['sendMessage'] >= SUBSCRIBED)
+                await asyncio.sleep(0.5)
+                delivered = Counter(
+                    int(params['chat_id']) for method, params in bot_api.requests if method == 'sendMessage'
+                )
+                assert delivered == Counter(subscribed)
+
+                # Taps are handled by the shard owning the user
+                bot_api.reset()
+                for index, user_id in enumerate(user_ids):
+                    router.forward(user_id, tap_update(index, user_id, 'view_stock'))
+                await wait_for(lambda: bot_api.calls['editMessageText'] >= len(user_ids))
+                deadline = time.monotonic() + TIMEOUT
+                while True:
+                    handled = [
+                        handler_count(await shard_get(session, port, '/metrics'), 'view_stock') for port in ports
+                    ]
+                    if sum(handled) >= len(user_ids) or time.monotonic() > deadline:
+                        break
+                    await asyncio.sleep(0.05)
+                assert handled == [spread[index] for index in range(SHARDS)]
+                edited = Counter(
+                    int(params['chat_id']) for method, params in bot_api.requests if method == 'editMessageText'
+                )
+                assert edited == Counter(user_ids)
+        finally:
+            await fetcher.post_shutdown(None)
+            await bot_api.stop()
+            await stock_api.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,40 @@
+import asyncio
+
+from aiohttp import web
+
+from stock_client import StockClient
+
+
+def test_unparseable_body_does_not_pin_validators():
+    bodies = ['{"timestamp": "t0", "da', '{"timestamp": "t0", "data": []}']
+    seen_headers = []
+
+    async def handle(request):
+        seen_headers.append(request.headers.get('If-None-Match'))
+        if request.headers.get('If-None-Match') == '"t0"':
+            return web.Response(status=304)
+        return web.Response(text=bodies.pop(0), content_type='application/json', headers={'ETag': '"t0"'})
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get('/api/garden', handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        client = StockClient(f"http://127.0.0.1:{port}/api/garden")
+        try:
+            try:
+                await client.fetch()
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("truncated body was accepted")
+            assert await client.fetch() == {'timestamp': 't0', 'data': []}
+            assert seen_headers == [None, None]
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+from fake_stock_api import FakeStockAPI
+from helpers import running_bot, stock_payload
+
+
+def test_missed_rotation_does_not_hold_back_the_next_one(workdir, monkeypatch):
+    import bot as bot_module
+    monkeypatch.setattr(bot_module, 'UPDATE_INTERVAL', 2)
+    monkeypatch.setattr(bot_module, 'POLL_FIRST_DELAY', 0.2)
+    monkeypatch.setattr(bot_module, 'POLL_BACKOFF', 1)
+
+    async def scenario():
+        stock_api = FakeStockAPI([
+            stock_payload('t0', {'SEEDS': {'Carrot': 1}}),
+            stock_payload('t1', {'SEEDS': {'Carrot': 2}}),
+            stock_payload('t2', {'SEEDS': {'Carrot': 2, 'Strawberry': 1}}),
+        ])
+        await stock_api.start()
+        try:
+            async with running_bot(stock_api) as (garden, bot_api, context):
+                garden.last_stock = stock_api.timeline[0]
+                user = garden.get_user_data(1)
+                user.toggle('SEEDS', 'Strawberry')
+                garden.index_user('1', user)
+                # t1 was published after the previous job gave up
+                stock_api.advance()
+
+                await asyncio.sleep(2 - time.time() % 2 + 0.01)
+                job = asyncio.create_task(garden.check_stock_updates(context))
+                await asyncio.sleep(0.3)
+                stock_api.advance()
+                await job
+                await garden.dispatcher.join()
+
+                assert garden.last_stock['timestamp'] == 't2'
+                sent = [params['text'] for method, params in bot_api.requests if method == 'sendMessage']
+                assert sent == ["✅ Strawberry in SEEDS - 1"]
+        finally:
+            await stock_api.stop()
+
+    asyncio.run(scenario())
+
+
+def test_stock_changed_during_restart_is_applied(workdir):
+    async def scenario():
+        stock_api = FakeStockAPI([
+            stock_payload('t0', {'SEEDS': {'Carrot': 1}}),
+            stock_payload('t1', {'SEEDS': {'Carrot': 1, 'Strawberry': 1}}),
+        ])
+        await stock_api.start()
+        try:
+            async with running_bot(stock_api) as (garden, bot_api, context):
+                # Warmed from last_stock.json before the restart
+                garden.last_stock = stock_api.timeline[0]
+                user = garden.get_user_data(1)
+                user.toggle('SEEDS', 'Strawberry')
+                garden.index_user('1', user)
+                stock_api.advance()
+
+                await garden.initial_stock_check(context)
+                await garden.dispatcher.join()
+
+                assert garden.last_stock['timestamp'] == 't1'
+                assert bot_api.calls['sendMessage'] == 1
+                stats = await garden.history.item_stats('Strawberry')
+                assert stats['appearances'] == 1
+        finally:
+            await stock_api.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,24 @@
+import json
+
+from storage import SQLiteUserStore
+
+
+def test_users_json_is_migrated_once(workdir):
+    users = {
+        '1': {'tracking_enabled': True, 'tracked_items': {'SEEDS': ['Carrot']}},
+        '2': {'tracking_enabled': False, 'tracked_items': {}},
+    }
+    (workdir / 'users.json').write_text(json.dumps(users))
+
+    store = SQLiteUserStore()
+    assert store.load() == users
+    store.close()
+    assert not (workdir / 'users.json').exists()
+    assert json.loads((workdir / 'users.json.migrated').read_text()) == users
+
+    # A users.json showing up again must not be imported over the database
+    (workdir / 'users.json').write_text(json.dumps({'3': {'tracking_enabled': True, 'tracked_items': {}}}))
+    store = SQLiteUserStore()
+    assert store.load() == users
+    store.close()
+    assert (workdir / 'users.json').exists()
@@ -0,0 +1,26 @@
+import asyncio
+from types import SimpleNamespace
+
+import aiohttp
+
+from web import SECRET_HEADER, WEBHOOK_PATH, WebServer
+
+
+def test_webhook_rejects_bodies_that_are_not_updates():
+    async def scenario():
+        application = SimpleNamespace(bot=None, update_queue=asyncio.Queue())
+        server = WebServer(application, bot=None, webhook_secret='secret', port=0)
+        await server.start()
+        port = server.runner.addresses[0][1]
+        try:
+            async with aiohttp.ClientSession(headers={SECRET_HEADER: 'secret'}) as session:
+                statuses = []
+                for body in ('not json', '{}', '[]', '5', '{"update_id": 1, "message": 5}', '{"update_id": 1}'):
+                    async with session.post(f"http://127.0.0.1:{port}{WEBHOOK_PATH}", data=body) as response:
+                        statuses.append(response.status)
+        finally:
+            await server.stop()
+        assert statuses == [400, 400, 400, 400, 400, 200]
+        assert application.update_queue.qsize() == 1
+
+    asyncio.run(scenario())